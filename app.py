@@ -1,64 +1,157 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from datetime import datetime, timezone
-import pandas as pd
-from supabase import create_client
-from streamlit_gsheets import GSheetsConnection
-from time import sleep
-from streamlit_extras.stylable_container import stylable_container
+from time import monotonic
+import threading
+import uuid
+import instrumentation
+from instrumentation import log_event, timed, timed_fragment, timed_polling_fragment
+from static_assets import get_logo, get_page_icon, get_stylesheet, LOGO_WIDTH
+from example_updates import SIMPLE_EXAMPLES, STRUCTURED_EXAMPLES
+
+instrumentation.start_rerun("app")
 
 # Use wide layout
 st.set_page_config(layout="wide",
-                   page_icon="hsma_icon.png",
+                   page_icon=get_page_icon(),
                    page_title="HSMA Project Progress Reporter")
 
 # Import stylesheet for font and page margin setting
-with open("style.css") as css:
-    st.markdown(f'<style>{css.read()}</style>', unsafe_allow_html=True)
+st.markdown(get_stylesheet(), unsafe_allow_html=True)
+
+# Set up header with title and logo
+header_col_l, header_col_r = st.columns([0.7, 0.3], vertical_alignment="center")
+
+with header_col_r:
+    st.image(get_logo(), width=LOGO_WIDTH)
+
+with header_col_l:
+    # Title for app
+    st.title("The HSMA Project Progress Tracker")
+
+instrumentation.mark("header_drawn")
+
+# pandas, the storage backends and the form styling take a while to import, so on a cold start
+# they are only imported once the header is on screen (later reruns find them already loaded)
+import pandas as pd
+from streamlit_extras.stylable_container import stylable_container
+from drafts import DraftStore
+from submission_queue import SubmissionQueue, add_idempotency_keys, STATUS_SENT, STATUS_FAILED
+from data_access import get_backend, get_proj_register_df, prefetch, PROJECT_PLACEHOLDER
+
+# Start loading the project register straight away - it is only waited for when the project picker
+# is drawn, so it comes in while the parts of the page that don't need it are being drawn
+prefetch(get_proj_register_df)
 
 # Initialise session state variables
-if 'existing_projects' not in st.session_state:
-    st.session_state.existing_projects = pd.DataFrame()
-if 'project_updates' not in st.session_state:
-    st.session_state.project_updates = None
+if 'latest_update' not in st.session_state:
+    st.session_state.latest_update = None
 if 'project' not in st.session_state:
-    st.session_state.project = None
+    st.session_state.project = PROJECT_PLACEHOLDER
+if 'project_code' not in st.session_state:
+    st.session_state.project_code = None
+if 'pending_submissions' not in st.session_state:
+    st.session_state.pending_submissions = []
+if 'failed_submissions' not in st.session_state:
+    st.session_state.failed_submissions = []
+# Namespace for the idempotency keys of this session's submissions
+if 'submission_namespace' not in st.session_state:
+    st.session_state.submission_namespace = uuid.uuid4()
 
 st.session_state.message = {'type': "none", 'message': ''}
 
-# Create a Google Sheets Connection
+# Background queue that writes submitted logs to Supabase, retrying with backoff,
+# so the page doesn't hang while a write is retried
+# Queued logs are kept in a local SQLite outbox so they survive an app restart
 @st.cache_resource
-def get_gs_connection():
-    return st.connection("gsheets", type=GSheetsConnection)
+def get_submission_queue():
+    return SubmissionQueue(
+        insert_rows=lambda entry_rows: get_backend().insert_logs(entry_rows),
+        on_sent=lambda entry_rows: record_new_logs(get_project_log_store(), entry_rows)
+        )
 
-gs_conn = get_gs_connection()
+submission_queue = get_submission_queue()
 
-# Function to initialise a Supabase DB connection from details stored in secrets
+# Unsent drafts of each submitter's update for each project, saved in the background
 @st.cache_resource
-def init_supabase_connection():
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
-    return create_client(url, key)
-
-# Create Supabase DB connection
-supabase = init_supabase_connection()
-
-# Function to grab everything from the HSMA project register spreadsheet
-@st.cache_data(ttl=60)
-def get_proj_register_df():
-    hsma_proj_reg_df = gs_conn.read()
-    hsma_proj_reg_df = hsma_proj_reg_df.sort_values("Project Code")
-    hsma_proj_reg_df["Full Project Title"] = hsma_proj_reg_df["Project Code"].astype('str') + ": " + hsma_proj_reg_df["Project Title"]
-    hsma_proj_reg_df["Full Project Title and Leads"] = hsma_proj_reg_df["Full Project Title"] + " (" + hsma_proj_reg_df["Lead"] + ")"
-    return hsma_proj_reg_df
-
-# Function to grab everything in the Supabase table of project logs
-def run_query_main():
-    return supabase.table("ProjectLogs").select("*").execute()
-
-# Set up entries for project list dropdown
-hsma_proj_reg_df = get_proj_register_df()
-project_list = ["Please Select a Project"]
-project_list =  project_list + hsma_proj_reg_df['Full Project Title and Leads'].tolist()
+def get_draft_store():
+    return DraftStore()
+
+draft_store = get_draft_store()
+
+# Keys of the text boxes whose contents are kept in a draft
+DRAFT_FIELDS = ["simple_update", "structured_progress", "structured_meetings",
+                "structured_challenges", "structured_plans", "structured_other"]
+
+def current_draft_fields():
+    return {field: st.session_state.get(field, "") for field in DRAFT_FIELDS}
+
+# Called at the end of each form - the store only writes a draft once it stops changing
+# Text that has just been submitted isn't saved, so it isn't offered back as a draft
+def autosave_draft():
+    if st.session_state.get("project_code") is None or st.session_state.get("submitter_name", "") == "":
+        return
+    fields = current_draft_fields()
+    if fields != st.session_state.get("submitted_fields"):
+        draft_store.save(st.session_state.submitter_name, st.session_state.project_code, fields)
+
+def restore_draft(fields):
+    for field, value in fields.items():
+        st.session_state[field] = value
+
+def discard_draft():
+    draft_store.discard(st.session_state.submitter_name, st.session_state.project_code)
+
+# Once a submission has been queued its draft is no longer needed
+def draft_submitted():
+    st.session_state.submitted_fields = current_draft_fields()
+    discard_draft()
+
+# True when a fragment is being rerun on its own rather than as part of the whole page
+# In a whole-page rerun, everything drawn after a fragment is already being drawn afresh, so the
+# fragment mustn't call st.rerun() - that would end the run before the project picker is drawn,
+# and Streamlit would forget which project was chosen
+def in_fragment_rerun():
+    return len(get_script_run_ctx().fragment_ids_this_run) > 0
+
+# The unsent draft for the chosen project and submitter, if it differs from what's in the boxes
+def draft_to_offer():
+    if st.session_state.get("project_code") is None or st.session_state.get("submitter_name", "") == "":
+        return None
+    draft = draft_store.load(st.session_state.submitter_name, st.session_state.project_code)
+    if draft is None or draft["fields"] == current_draft_fields():
+        return None
+    return draft
+
+# Offer to bring back an unsent draft - drawn with the project picker, so choosing a project offers
+# its draft straight away
+def draft_prompt():
+    draft = draft_to_offer()
+    st.session_state.draft_offered = draft
+    if draft is None:
+        return
+
+    saved_at = pd.Timestamp(draft["saved_at"]).strftime("%A, %B %d at %H:%M")
+    st.info(f"You have an unsent draft update for this project from {saved_at}", icon=":material/edit_note:")
+    restore_col, discard_col, _ = st.columns([0.2, 0.2, 0.6])
+    # Restoring fills in both forms, so the whole page is rerun to show it
+    if restore_col.button("Restore draft", on_click=restore_draft, args=(draft["fields"],),
+                          icon=":material/restore:", use_container_width=True) and in_fragment_rerun():
+        st.rerun()
+    discard_col.button("Discard draft", on_click=discard_draft, icon=":material/delete:", use_container_width=True)
+
+# How long (in seconds) a project's cached latest update is served before checking the database again,
+# while the change feed isn't connected - when it is, new logs arrive through the feed instead
+PROJECT_UPDATES_TTL = 60
+# How often (in seconds) the 'last updated' status is redrawn from the process-wide store
+STATUS_REDRAW_INTERVAL = 5
+# How many of the projects matching the search box are offered in the project dropdown
+PROJECT_SEARCH_RESULTS = 50
+
+# Function to grab the most recent update for a single project
+# The database works out the latest row, so only one row ever comes back however many logs the project has
+def run_query_latest_update(project_code):
+    return get_backend().get_latest_update(project_code)
 
 def celebrate():
     if datetime.now().month == 12:
@@ -72,65 +165,207 @@ def update_message():
     elif st.session_state.message['type'] == 'warning':
         st.warning(st.session_state.message["text"])
 
-# Set up header with title and logo
-header_col_l, header_col_r = st.columns([0.7, 0.3], vertical_alignment="center")
-
-with header_col_r:
-    st.image("hsma_logo_wide_white.png", width=300)
-
-with header_col_l:
-    # Title for app
-    st.title("The HSMA Project Progress Tracker")
-
-# Set up entry for project code
-st.session_state.project = st.selectbox(
-            """**What Project Does this Relate to?**
-            \n\nStart typing a project code, title or team member to filter the project list, or scroll down to find your project.
-            """,
-            project_list,
-            help="Note that only projects that have been registered via the 'new project airlock' channel on Slack will appear in this list."
-        )
-
-if st.session_state.project != "Please Select a Project":
-    st.session_state.project_code = hsma_proj_reg_df[hsma_proj_reg_df['Full Project Title and Leads'] == st.session_state.project]['Project Code'].values[0]
-else:
-    st.session_state.project_code = None
-
+# The stored form of a project's latest update - created_at, submitter and display_date
+def as_latest_update(row):
+    created_at = pd.Timestamp(row["created_at"])
+    return {
+        "created_at": created_at,
+        "submitter": row["submitter"],
+        "display_date": created_at.strftime("%A, %B %d %Y at %H:%M")
+    }
+
+# Whichever of two latest updates (either of which may be None) is the more recent
+def more_recent(latest_update, other):
+    if latest_update is None or (other is not None and other["created_at"] > latest_update["created_at"]):
+        return other
+    return latest_update
+
+# Process-wide store of the latest update for each project, shared by every session
+# so that a room full of users looking at the same projects doesn't multiply the database reads
+# It listens to the change feed of new logs, so it is kept current without going back to the database
+@st.cache_resource(show_spinner=False)
+def get_project_log_store():
+    store = {"lock": threading.Lock(), "projects": {}, "feed": get_backend().change_feed()}
+    store["feed"].subscribe(lambda rows: record_new_logs(store, rows))
+    return store
+
+def get_project_entry(store, project_code):
+    with store["lock"]:
+        return store["projects"].setdefault(
+            int(project_code),
+            {"lock": threading.Lock(), "latest": None, "checked_at": None}
+            )
+
+# Move on the latest update of each project that newly written log rows belong to
+# Called by the change feed, and by the submission queue once this process has written a submission
+# (so a session sees its own log straight away even if the feed is down)
+def record_new_logs(store, rows):
+    latest_updates = {}
+    for row in rows:
+        project_code = int(row["project_code"])
+        latest_updates[project_code] = more_recent(latest_updates.get(project_code), as_latest_update(row))
+
+    for project_code, latest_update in latest_updates.items():
+        entry = get_project_entry(store, project_code)
+        with entry["lock"]:
+            entry["latest"] = more_recent(entry["latest"], latest_update)
+            entry["checked_at"] = monotonic()
+
+# Function to get the latest update for a project as a dictionary of created_at, submitter and
+# display_date (or None if the project has no updates yet)
+# The database is only read the first time a project is asked for - after that the change feed keeps
+# the copy current, unless the feed has been down since the copy was read and it is older than the TTL
+def get_latest_update(project_code):
+    project_code = int(project_code)
+    store = get_project_log_store()
+    entry = get_project_entry(store, project_code)
+    feed_live_since = store["feed"].live_since()
+
+    # Only one session refreshes a given project at a time - any others asking for it
+    # in the meantime wait and then get the freshly updated copy
+    with entry["lock"]:
+        if entry["checked_at"] is not None and (
+            (feed_live_since is not None and entry["checked_at"] >= feed_live_since)
+            or monotonic() - entry["checked_at"] < PROJECT_UPDATES_TTL
+        ):
+            return entry["latest"]
+
+        # Logs written once the read has started may not be in it, but will come through the feed
+        checked_at = monotonic()
+        latest_update = run_query_latest_update(project_code)
+        entry["latest"] = more_recent(entry["latest"], None if latest_update is None else as_latest_update(latest_update))
+        entry["checked_at"] = checked_at
+        return entry["latest"]
+
+@timed()
 def get_projects_df():
-    st.session_state.existing_projects = pd.DataFrame(run_query_main().data)
-    st.session_state.existing_projects = st.session_state.existing_projects[["created_at", "project_code", "submitter"]]
-    st.session_state.existing_projects["display_date"] = pd.to_datetime(st.session_state.existing_projects["created_at"]).dt.strftime("%A, %B %d %Y at %H:%M")
-    st.session_state.project_updates = st.session_state.existing_projects[st.session_state.existing_projects["project_code"] == st.session_state.project_code].sort_values("display_date", ascending=False)
-
-get_projects_df()
-
-def refresh_status():
+    if st.session_state.project_code is None:
+        st.session_state.latest_update = None
+    else:
+        st.session_state.latest_update = get_latest_update(st.session_state.project_code)
+
+# The 'last updated' status for the chosen project
+# Redrawn every few seconds from the process-wide store, so a log written from any session shows up
+# without anyone having to refresh the page - this only reads the database if the store has no copy
+@st.fragment(run_every=STATUS_REDRAW_INTERVAL)
+@timed_polling_fragment
+def project_status_f():
     get_projects_df()
 
-col_update_status_1, col_update_status_2 = st.columns([0.6,0.4])
-
-with col_update_status_1:
     if st.session_state.project_code is None:
         st.write("") # Blank line to try and avoid layout changing after project section
-    elif len(st.session_state.project_updates) > 0:
+    elif st.session_state.latest_update is not None:
         st.write(f"""This project last had an update recorded
-                on {st.session_state.project_updates.head(1)['display_date'].values[0]}
-                by {st.session_state.project_updates.head(1)['submitter'].values[0]}""")
-        st.write("*:grey[If you have just submitted a project update, this information will not be up to date! Hit the refresh button.]*")
+                on {st.session_state.latest_update['display_date']}
+                by {st.session_state.latest_update['submitter']}""")
     else:
         st.write("No project updates have been provided for this project yet.")
-        st.write("*:grey[If you have just submitted a project update, this information will not be up to date! Hit the refresh button.]*")
 
-if st.session_state.project_code is not None:
-    with col_update_status_2:
-        st.button("Refresh last updated date", icon=":material/autorenew:", on_click=refresh_status())
+# Project picker and the 'last updated' status for the chosen project
+# Changing project only reruns this part of the page
+@st.fragment
+@timed_fragment
+def project_picker_f():
+    # Set up entries for project list dropdown
+    proj_register = get_proj_register_df()
+
+    # The register is searched here rather than sent to the browser in full - only the best matches
+    # for the search box are offered in the dropdown
+    search_text = st.text_input(
+                """**What Project Does this Relate to?**
+                \n\nSearch for a project code, title or team member, press Enter, then pick your project from the list below.
+                """,
+                key="project_search",
+                placeholder="e.g. 12, simulation or a team member's name",
+                help="Note that only projects that have been registered via the 'new project airlock' channel on Slack will appear in this list."
+            )
+    matches, match_count = proj_register["search_index"].search(search_text, limit=PROJECT_SEARCH_RESULTS)
+
+    # Keep the project already chosen in the list, so searching again doesn't lose it
+    project_options = [PROJECT_PLACEHOLDER]
+    if st.session_state.project != PROJECT_PLACEHOLDER and st.session_state.project not in matches:
+        project_options.append(st.session_state.project)
+    project_options += matches
+
+    # Set up entry for project code
+    st.session_state.project = st.selectbox(
+                "Project",
+                project_options,
+                index=project_options.index(st.session_state.project),
+                label_visibility="collapsed"
+            )
+    if match_count == 0:
+        st.caption("No projects match your search.")
+    elif match_count > len(matches) and search_text.strip() == "":
+        st.caption(f"Showing the newest {len(matches)} of {match_count} projects, this cohort's first - search to find the others.")
+    elif match_count > len(matches):
+        st.caption(f"Showing the best {len(matches)} of {match_count} matching projects - search for more of the title or a team member to narrow them down.")
+
+    if st.session_state.project != PROJECT_PLACEHOLDER:
+        st.session_state.project_code = proj_register["project_codes"].get(st.session_state.project)
+    else:
+        st.session_state.project_code = None
 
+    project_status_f()
+    draft_prompt()
+
+# The project picker has to wait for the project register, and for the 'last updated' status of the
+# project chosen earlier in the session - both are fetched in the background while the rest of the
+# page is drawn, and the picker is drawn into the space kept for it here once the page is otherwise done
+if st.session_state.project_code is not None:
+    prefetch(get_latest_update, st.session_state.project_code)
+project_picker_slot = st.container()
+
+def failed_submission_warnings():
+    for submission in st.session_state.failed_submissions:
+        st.warning(f"Error Submitting Log for project {submission['project_code']} - Please Contact Dan or Sammi on Slack")
+
+# Poll the background queue for this session's submissions until they have all been written
+# This does nothing (and no database work) unless the session has something queued
+# Failures are drawn here too - the poll is usually a rerun of this fragment alone, so a warning
+# drawn elsewhere on the page wouldn't show until something else reran the whole page
+@st.fragment(run_every=2)
+@timed_polling_fragment
+def submission_status_f():
+    if len(st.session_state.pending_submissions) == 0:
+        failed_submission_warnings()
+        return
+
+    still_pending = []
+    for submission in st.session_state.pending_submissions:
+        instrumentation.count("outbox_reads")
+        status = submission_queue.get_status(submission["id"])
+        if status is None or status["status"] == STATUS_SENT:
+            st.toast(f"Your log for project {submission['project_code']} has been saved", icon=":material/check_circle:")
+            celebrate()
+        elif status["status"] == STATUS_FAILED:
+            st.session_state.failed_submissions.append(submission)
+        else:
+            still_pending.append(submission)
+            st.info(f"Saving your log for project {submission['project_code']}...", icon=":material/sync:")
+
+    if len(still_pending) < len(st.session_state.pending_submissions):
+        st.session_state.pending_submissions = still_pending
+    failed_submission_warnings()
+
+submission_status_f()
 
 st.write("---")
 
-st.session_state.submitter_name = st.text_input(
-            "**What's your name?**\n\n*Please include your first name and surname*"
-        )
+# Typing a name only reruns this part of the page
+@st.fragment
+@timed_fragment
+def submitter_f():
+    st.session_state.submitter_name = st.text_input(
+                "**What's your name?**\n\n*Please include your first name and surname*",
+                key="submitter"
+            )
+    # The draft prompt is drawn with the project picker, so if the name typed changes which draft
+    # there is to offer, the whole page is rerun to redraw it
+    if in_fragment_rerun() and draft_to_offer() != st.session_state.get("draft_offered"):
+        st.rerun()
+
+submitter_f()
 
 st.write("---")
 st.subheader("Submit your Progress Report")
@@ -148,6 +383,11 @@ def clear_textboxes():
     st.session_state.structured_challenges = ""
     st.session_state.structured_plans = ""
     st.session_state.structured_other = ""
+    # Deliberately submitting the same text again after clearing the boxes gives it new keys
+    st.session_state.submission_namespace = uuid.uuid4()
+    # Empty boxes are never saved over a draft, so the cleared text's draft is deleted here
+    if st.session_state.get("project_code") is not None and st.session_state.get("submitter_name", "") != "":
+        discard_draft()
 
 col_c.button("Clear All Text Boxes", icon=":material/delete:" ,
             on_click=clear_textboxes,
@@ -157,137 +397,79 @@ col_c.button("Clear All Text Boxes", icon=":material/delete:" ,
 
 project_form_simple, project_form_structured = st.tabs(["Quick", "Structured"])
 
+# Hand a submission's rows to the background queue, and remember it so this session can
+# show its progress until it has been written
+# Each row gets an idempotency key first, so the queue can safely retry a write that may have
+# gone through, and a second click of 'Submit' hands back the submission already queued
+def queue_submission(entry_rows):
+    entry_rows = add_idempotency_keys(entry_rows, st.session_state.submission_namespace)
+    submission_id = submission_queue.submit(entry_rows)
+    log_event("submission_queued", submission_id=submission_id, project_code=entry_rows[0]["project_code"], rows=len(entry_rows))
+    if submission_id not in [submission["id"] for submission in st.session_state.pending_submissions]:
+        st.session_state.pending_submissions.append(
+            {"id": submission_id, "project_code": entry_rows[0]["project_code"]}
+            )
+    # Submitting a log that had failed queues it to be tried again
+    st.session_state.failed_submissions = [
+        submission for submission in st.session_state.failed_submissions if submission["id"] != submission_id
+        ]
+
 def run_simple_submit():
-    print(f"Project Code: {st.session_state.project_code}")
-    print(f"Submitter: {st.session_state.submitter_name}")
-    print(f"Update: {st.session_state.project_update}")
+    log_event("submit_clicked", form="simple", project_code=st.session_state.project_code,
+              submitter=st.session_state.submitter_name, update_length=len(st.session_state.project_update))
     if st.session_state.project_code is None:
         st.session_state.message = {
                 "type": "warning",
                 "text": "Please select a project before submitting"
                 }
-        print("==Not submitted - project not selected==")
+        log_event("submit_rejected", reason="project not selected")
     elif st.session_state.submitter_name == "":
         st.session_state.message = {
                         "type": "warning",
                         "text": "Please enter your name before submitting"
                         }
-        print("==Not submitted - name not entered==")
+        log_event("submit_rejected", reason="name not entered")
     elif st.session_state.project_update == "":
         st.session_state.message = {
                         "type": "warning",
                         "text": "Please enter your update before submitting"
                         }
-        print("==Not submitted - no update entered==")
+        log_event("submit_rejected", reason="no update entered")
     else:
-        with st.spinner("Submitting Log..."):
-
-            entry_dict = {
-                        "created_at": datetime.now(timezone.utc).isoformat(),
-                        "project_code": int(st.session_state.project_code), # Ensure not passing as int64, which table will reject
-                        "submitter": st.session_state.submitter_name,
-                        "entry_type": "Simple Log",
-                        "entry": st.session_state.project_update
-                    }
-
-            try:
-                print(f"Attempting to write")
-                response = (
-                    supabase.table("ProjectLogs").insert(entry_dict).execute()
-                )
-                if response.data:
-                    print("Successfully written to ProjectLogs table on first try")
-                    st.session_state.message = {
-                                "type": "success",
-                                "text": f"""
-                                         Project Log Submitted Successfully!
-                                         \n\n**Project**: {st.session_state.project_code}
-                                         \n\n**Submitter**: {st.session_state.submitter_name}
-                                         \n\n**Log**: {st.session_state.project_update}
-                                         """
-                                }
-                    celebrate()
-                else:
-                    raise Exception(response.error.message)
-            except Exception as e:
-                error_message = str(e)
-                print(f"Error occurred: {error_message}")
-                # print("Error encountered while trying to write to ProjectLogs table.")
-                print("Trying again...")
-                i = 1
-                while i<=30:
-                    try:
-                        print(f"Retry {i}")
-                        response = (
-                            supabase.table("ProjectLogs").insert(entry_dict).execute()
-                        )
-                        if response.data:
-                            print(f"Successfully written on retry {i}")
-                            st.session_state.message = {
-                                "type": "success",
-                                "text": f"""
-                                         Project Log Submitted Successfully!
-                                         \n\n**Project**: {st.session_state.project_code}
-                                         \n\n**Submitter**: {st.session_state.submitter_name}
-                                         \n\n**Log**: {st.session_state.project_update}
-                                         """
-                                }
-
-                            celebrate()
-                        else:
-                            raise Exception(response.error.message)
-                        break
-                    except Exception as e:
-                        error_message = str(e)
-                        print(f"Error occurred: {error_message}")
-                        i += 1
-                        sleep(0.5)
-                else:
-                    st.session_state.message = {
-                        "type": "warning",
-                        "text": "Error Submitting Log - Please Contact Dan or Sammi on Slack"
-                        }
-    get_projects_df()
-
-
-@st.fragment
-def project_form_simple_f():
-    col_form_left, col_form_right = st.columns([0.7, 0.3])
-
-    with col_form_right:
-
-        st.subheader("Example Updates")
-
-        example_update_1, example_update_2, example_update_3 = st.tabs(["Example 1", "Example 2", "Example 3"])
-
-        example_update_1.info(
-        """
-            This month we have been focussing on developing our understanding of the ED and engaging with key stakeholders.
-
-            We have started to arrange an expert panel of ED staff to gather insights on workflow, patient flow patterns, and resource allocation challenges.
+        entry_dict = {
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "project_code": int(st.session_state.project_code), # Ensure not passing as int64, which table will reject
+                    "submitter": st.session_state.submitter_name,
+                    "entry_type": "Simple Log",
+                    "entry": st.session_state.project_update
+                }
 
-            We have also started pulling out historical arrival patterns and conducting some exploratory data analysis to see how different patient groups differ and if there are data quality issues.
+        queue_submission([entry_dict])
+        draft_submitted()
 
-            In the next month, we will be focussing on first version of a conceptual model of the ED for review by the expert panel.
-            We'll also finish conducting our EDA and produce a first suggested list of patient groups that may require different activity time or arrival time distributions.
-            """)
-        example_update_2.info(
-            """
-            Due to sickness in the project team this month, we have been unable to progress the project as planned.
+        st.session_state.message = {
+                    "type": "success",
+                    "text": f"""
+                             Project Log Received - it will be saved in the background
+                             \n\n**Project**: {st.session_state.project_code}
+                             \n\n**Submitter**: {st.session_state.submitter_name}
+                             \n\n**Log**: {st.session_state.project_update}
+                             """
+                    }
 
-            We have rescheduled the planned meeting to show our model to the stakeholders to next month.
 
-            Currently we are having trouble gaining agreement to publish our code on GitHub.
-            """
-                        )
-        example_update_3.info("""
-            Most of my project time this month has been spent exploring the literature and other sources like Github to see if anyone else has done work in this area.
-            I haven't found any code I can adapt, but I did find an interesting paper on non-attendance prediction by Mark et al (2019) where they achieved an AUC of 0.79.
+# Examples are drawn outside the form's fragment, so they aren't sent to the browser again
+# every time the form reruns
+def simple_examples():
+    st.subheader("Example Updates")
 
-            I'm currently blocked by waiting for data access so will continue to explore the literature and write some template code.
+    for example_tab, example in zip(st.tabs(["Example 1", "Example 2", "Example 3"]), SIMPLE_EXAMPLES):
+        example_tab.info(example)
 
-                        """
-                        )
+@st.fragment
+@timed_fragment
+def project_form_simple_f():
+    col_form_left = st.container()
 
     with col_form_left:
 
@@ -302,7 +484,7 @@ def project_form_simple_f():
 
     with submit_col_1a:
         with stylable_container(
-            "green",
+            "green_simple",
             css_styles="""
             button {
                 background-color: #0A524E;
@@ -349,123 +531,85 @@ Project Progress: {st.session_state.simple_update}
         with col_form_left.empty():
             update_message()
 
+    autosave_draft()
+
 
 
 with project_form_simple:
-    project_form_simple_f()
+    col_form_left, col_form_right = st.columns([0.7, 0.3])
+
+    with col_form_right:
+        simple_examples()
+
+    with col_form_left:
+        project_form_simple_f()
 
 def run_structured_submit():
     # key_progress_log, key_meetings_log, additional_notes_log
     # challenges_log, key_planned_activities_log, other_comments_log
-    print(f"Project Code: {st.session_state.project_code}")
-    print(f"Submitter: {st.session_state.submitter_name}")
+    log_event("submit_clicked", form="structured", project_code=st.session_state.project_code,
+              submitter=st.session_state.submitter_name)
 
     if st.session_state.project_code is None:
         st.session_state.message = {
                 "type": "warning",
                 "text": "Please select a project before submitting"
                 }
-        print("==Not submitted - project not selected==")
+        log_event("submit_rejected", reason="project not selected")
     elif st.session_state.submitter_name == "":
         st.session_state.message = {
                         "type": "warning",
                         "text": "Please enter your name before submitting"
                         }
-        print("==Not submitted - name not entered==")
+        log_event("submit_rejected", reason="name not entered")
     elif (st.session_state.key_progress_log == ""):
         st.session_state.message = {
                         "type": "warning",
                         "text": "Please enter an update in at least the 'Project Progress' box before submitting"
                         }
-        print("==Not submitted - no update entered==")
+        log_event("submit_rejected", reason="no update entered")
     else:
-        with st.spinner("Submitting Log..."):
-
-            structured_log_dict = [
-                {"entry_type": "Structured Log - Progress", "entry": st.session_state.key_progress_log},
-                {"entry_type": "Structured Log - Meetings", "entry": st.session_state.key_meetings_log},
-                {"entry_type": "Structured Log - Challenges", "entry": st.session_state.challenges_log},
-                {"entry_type": "Structured Log - Planned Activities", "entry": st.session_state.key_planned_activities_log},
-                {"entry_type": "Structured Log - Other Comments", "entry": st.session_state.other_comments_log},
-            ]
-
-            for instance, box in enumerate(structured_log_dict):
-                entry_dict = {
-                            "created_at": datetime.now(timezone.utc).isoformat(),
-                            "project_code": int(st.session_state.project_code), # Ensure not passing as int64, which table will reject
-                            "submitter": st.session_state.submitter_name,
-                            "entry_type": box["entry_type"],
-                            "entry": box["entry"]
-                        }
-
-                if box["entry"] != "":
-                    try:
-                        print(f"Attempting to write")
-                        response = (
-                            supabase.table("ProjectLogs").insert(entry_dict).execute()
-                        )
-                        if response.data:
-                            print("Successfully written to ProjectLogs table on first try")
-                            if instance == 0:
-                                st.session_state.message = {
-                                    "type": "success",
-                                    "text": f"""
-                                            Project Log Submitted Successfully!
-                                            \n\n**Project**: {st.session_state.project_code}
-                                            \n\n**Submitter**: {st.session_state.submitter_name}
-                                            \n\n**{box["entry_type"]}**: {box["entry"]}
-                                            """
-                                    }
-                            else:
-                                st.session_state.message["text"] += f"""\n\n**{box["entry_type"]}**: {box["entry"]}"""
-                            celebrate()
-                        else:
-                            raise Exception(response.error.message)
-                    except Exception as e:
-                        error_message = str(e)
-                        print(f"Error occurred: {error_message}")
-                        # print("Error encountered while trying to write to ProjectLogs table.")
-                        print("Trying again...")
-                        i = 1
-                        while i<=10:
-                            try:
-                                print(f"Retry {i}")
-                                response = (
-                                    supabase.table("ProjectLogs").insert(entry_dict).execute()
-                                )
-                                if response.data:
-                                    print(f"Successfully written on retry {i}")
-                                    if instance == 0:
-                                        st.session_state.message = {
-                                    "type": "success",
-                                    "text": f"""
-                                            Project Log Submitted Successfully!
-                                            \n\n**Project**: {st.session_state.project_code}
-                                            \n\n**Submitter**: {st.session_state.submitter_name}
-                                            \n\n**{box["entry_type"]}**: {box["entry"]}
-                                            """
-                                    }
-                                    else:
-                                        st.session_state.message["text"] += f"""\n\n**{box["entry_type"]}**: {box["entry"]}"""
-                                    celebrate()
-                                else:
-                                    raise Exception(response.error.message)
-                                break
-                            except Exception as e:
-                                error_message = str(e)
-                                print(f"Error occurred: {error_message}")
-                                i += 1
-                                sleep(0.5)
-                        else:
-                            st.session_state.message = {
-                        "type": "warning",
-                        "text": "Error Submitting Log - Please Contact Dan or Sammi on Slack"
-                        }
+        structured_log_dict = [
+            {"entry_type": "Structured Log - Progress", "entry": st.session_state.key_progress_log},
+            {"entry_type": "Structured Log - Meetings", "entry": st.session_state.key_meetings_log},
+            {"entry_type": "Structured Log - Challenges", "entry": st.session_state.challenges_log},
+            {"entry_type": "Structured Log - Planned Activities", "entry": st.session_state.key_planned_activities_log},
+            {"entry_type": "Structured Log - Other Comments", "entry": st.session_state.other_comments_log},
+        ]
+
+        # All boxes from the same report share a timestamp, and are written in a single
+        # multi-row insert so the report is either stored in full or not at all
+        created_at = datetime.now(timezone.utc).isoformat()
+
+        entry_rows = [
+            {
+                "created_at": created_at,
+                "project_code": int(st.session_state.project_code), # Ensure not passing as int64, which table will reject
+                "submitter": st.session_state.submitter_name,
+                "entry_type": box["entry_type"],
+                "entry": box["entry"]
+            }
+            for box in structured_log_dict
+            if box["entry"] != ""
+        ]
+
+        queue_submission(entry_rows)
+        draft_submitted()
 
-    get_projects_df()
+        st.session_state.message = {
+            "type": "success",
+            "text": f"""
+                    Project Log Received - it will be saved in the background
+                    \n\n**Project**: {st.session_state.project_code}
+                    \n\n**Submitter**: {st.session_state.submitter_name}
+                    """
+            }
+        for row in entry_rows:
+            st.session_state.message["text"] += f"""\n\n**{row["entry_type"]}**: {row["entry"]}"""
 
 
 @st.fragment
+@timed_fragment
 def project_form_structured_f():
 
     st.write("""Fill in as many of the boxes below as you would like, **then click the 'Submit' button at the bottom of the page**.
@@ -477,14 +621,7 @@ def project_form_structured_f():
 
     key_progress.write("#### Project Progress")
     with key_progress.expander("Click here for an example entry"):
-        st.info(
-        """
-        - Main area of focus was continuing with exploratory data analysis and data quality assessment of available data.
-        - Continued to develop understanding of urgent care system.
-        - Visually explored care pathways and diagnostic history of frequent users of and packaged into reusable interactive HTML format that could be distributed (however, further polish would be required, plus IG considerations). This is effectively an R/Plotly implementation of the Theograph concept that could be further developed.
-        - Additional reading of emergency department modelling literature; storing this in Zotero for reference during writeup.
-        """
-        )
+        st.info(STRUCTURED_EXAMPLES["progress"])
 
     st.session_state.key_progress_log = key_progress.text_area(
         """**MANDATORY FIELD**
@@ -495,12 +632,7 @@ def project_form_structured_f():
 
     key_meetings.write("#### Project-related Meetings")
     with key_meetings.expander("Click here for an example entry"):
-        st.info(
-        """
-        - Afternoon in-person with head of operations to discuss work so far and explore additional areas of interest
-        - Chat with Bob Bobson (HSMA 5 alumni) about experience working on a similar project last year - identified areas of potential code reuse
-        """
-        )
+        st.info(STRUCTURED_EXAMPLES["meetings"])
     st.session_state.key_meetings_log = key_meetings.text_area(
         """*OPTIONAL FIELD*
         \n\nProvide a brief overview of any meetings you have had with stakeholders or other parties since your last update
@@ -517,14 +649,7 @@ def project_form_structured_f():
 
     challenges.write("#### Challenges")
     with challenges.expander("Click here for an example entry"):
-        st.info(
-        """
-        - Continued difficulty with access to relevant ICB dashboards due to licencing.
-        - Large volume of ad-hoc requests have limited additional time available for project work
-        - Short month due to bank holidays and one member of team on annual leave for 2 weeks
-        - We're getting good engagement in general, but there's been some misunderstandings about the simplifications in the model that needs to be addressed
-        """
-        )
+        st.info(STRUCTURED_EXAMPLES["challenges"])
     st.session_state.challenges_log = challenges.text_area(
         """*OPTIONAL FIELD*
         \n\n• What challenges have you faced in your project since your last update?
@@ -537,17 +662,7 @@ def project_form_structured_f():
 
     key_planned_activities.write("#### Next Steps")
     with key_planned_activities.expander("Click here for an example entry"):
-        st.info(
-        """
-        Activities:
-        - Get all steps required to fully automate data flows complete.
-        - Add in additional sliders to model to allow for manual tweaking of demand forecasts.
-
-        Key meetings
-        - Meeting with operational lead on 6th April to discuss training and implementation plans, plus post-implementation review and next steps
-        - Presenting work in emergency care board meeting on 7th April
-        """
-        )
+        st.info(STRUCTURED_EXAMPLES["plans"])
     st.session_state.key_planned_activities_log = key_planned_activities.text_area(
         """*OPTIONAL FIELD*
         \n\n• What are you planning to do in the next month?
@@ -561,16 +676,7 @@ def project_form_structured_f():
     other_comments.write("#### Other Comments")
 
     with other_comments.expander("Click here for an example entry"):
-        st.info(
-        """
-        A request for a dashboard to support bed delivery meetings came in – a colleague was able to adapt my work to quickly provide all of the data required for these meetings.
-        Feedback from this group has been positive.
-
-        Two follow-up meetings regarding wider implementation and potential for dissemination of learning came out of the presentation to our expert panel, and the following feedback was received
-        from an ICB colleague present at this presentation: "The project team have just blown everyone’s minds with how they have engaged with operational end-users in a complex area and developed a model that are what everyone didn’t know they needed and didn’t think was possible.
-        Really helped showcase the potential of data and the need to invest in the capacity and capability of data science.”
-        """
-        )
+        st.info(STRUCTURED_EXAMPLES["other"])
 
     st.session_state.other_comments_log = other_comments.text_area(
     """*OPTIONAL FIELD*
@@ -654,7 +760,7 @@ Submitted by {st.session_state.submitter_name}
 
     with submit_col_1:
         with stylable_container(
-            "green",
+            "green_structured",
             css_styles="""
             button {
                 background-color: #0A524E;
@@ -682,5 +788,40 @@ Submitted by {st.session_state.submitter_name}
     with st.empty():
         update_message()
 
+    autosave_draft()
+
 with project_form_structured:
     project_form_structured_f()
+
+instrumentation.mark("forms_drawn")
+
+with project_picker_slot:
+    project_picker_f()
+
+instrumentation.mark("project_picker_drawn")
+
+# Diagnostics panel, shown when the page is opened with ?debug in the URL
+def diagnostics_panel(this_rerun):
+    with st.expander("Diagnostics", icon=":material/monitoring:"):
+        st.caption(
+            f"This run took {this_rerun['total_ms']:.0f} ms, with "
+            f"{this_rerun['counters'].get('db_reads', 0)} database reads, "
+            f"{this_rerun['counters'].get('db_writes', 0)} database writes and "
+            f"{this_rerun['counters'].get('sheets_reads', 0)} Google Sheets reads"
+            )
+
+        st.write("**Timings across recent reruns (ms)**")
+        st.dataframe(pd.DataFrame.from_dict(instrumentation.get_percentiles(), orient="index"),
+                     use_container_width=True)
+
+        st.write("**Call counts since the app started**")
+        st.json(instrumentation.get_counter_totals())
+
+        st.write("**Recent reruns**")
+        st.dataframe(pd.DataFrame(instrumentation.get_recent_reruns()[:50]),
+                     hide_index=True, use_container_width=True)
+
+this_rerun = instrumentation.finish_rerun()
+
+if "debug" in st.query_params:
+    diagnostics_panel(this_rerun)
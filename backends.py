@@ -0,0 +1,263 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from change_feed import LocalChangeFeed, SupabaseChangeFeed
+
+# Which storage backend the app uses - 'supabase' for the live services, or 'local' for an offline
+# stand-in (SQLite for the project logs and a CSV or Parquet file for the register) that needs no credentials
+TRACKER_BACKEND = os.environ.get("TRACKER_BACKEND", "supabase")
+TRACKER_LOCAL_DB = os.environ.get("TRACKER_LOCAL_DB", "local_project_logs.db")
+TRACKER_LOCAL_REGISTER = os.environ.get("TRACKER_LOCAL_REGISTER", "local_project_register.csv")
+# Seconds the local stand-in waits before answering each call, to mimic the round trip to the live services
+TRACKER_LOCAL_DELAY = float(os.environ.get("TRACKER_LOCAL_DELAY", "0"))
+# Folder standing in for Supabase Storage with the local backend
+TRACKER_LOCAL_STORAGE = os.environ.get("TRACKER_LOCAL_STORAGE", "local_storage")
+
+# Supabase view returning one row per project with the time and submitter of its most recent log
+# See sql/project_latest_update.sql
+LATEST_UPDATE_VIEW = "project_latest_update"
+
+# Columns of the ProjectLogs table
+LOG_COLUMNS = ["id", "created_at", "project_code", "submitter", "entry_type", "entry"]
+
+# Supabase Storage bucket holding the archived logs of closed cohorts (see log_archive.py)
+# See sql/project_logs_cohorts.sql
+ARCHIVE_BUCKET = "log-archive"
+# Number of ids named in each delete of archived logs - keeps each request's URL to a sensible length
+DELETE_BATCH_SIZE = 200
+
+# Column of ProjectLogs holding the key each row is given when it is submitted - it has a unique
+# constraint, so writing a row a second time (e.g. retrying after a timeout) is a no-op
+# See sql/project_logs_idempotency_key.sql
+IDEMPOTENCY_KEY_COLUMN = "idempotency_key"
+
+
+# Storage backends for the tracker
+#
+# Every backend provides the same methods, so the app doesn't need to know where
+# the project register and project logs actually live:
+#
+# read_register()                  - the project register as a dataframe
+# insert_logs(rows)                - write a list of log rows in one go, raising an error if it fails
+#                                    rows whose idempotency key is already stored are skipped
+# get_latest_update(project_code)  - dict of created_at and submitter for a project's latest log, or None
+# get_logs(columns, after_id, limit, project_code, project_codes)
+#                                  - up to 'limit' logs with an id greater than 'after_id' (optionally just
+#                                    for one project, or a list of projects) in id order, for paging through the table
+# delete_logs(ids)                 - delete the logs with the given ids, once they have been archived
+#                                    (see log_archive.py)
+# list_archives()                  - dict of the name of each file in the archive store to its version,
+#                                    which changes whenever the file is replaced
+# upload_archive(name, path)       - store the file at 'path' in the archive store, replacing any earlier copy
+# download_archive(name, path)     - copy a file from the archive store to 'path'
+# change_feed()                    - the feed of log rows as they are written (see change_feed.py)
+
+
+# The live backend - project logs in Supabase and the project register in Google Sheets
+class SupabaseBackend:
+
+    def __init__(self, supabase, gs_conn):
+        self.supabase = supabase
+        self.gs_conn = gs_conn
+        self._change_feed = SupabaseChangeFeed(supabase.realtime_url, supabase.supabase_key)
+
+    def read_register(self):
+        return self.gs_conn.read()
+
+    # Rows already written by an earlier attempt are ignored rather than duplicated
+    # Any failure raises an APIError - the response is empty if every row was already there
+    def insert_logs(self, rows):
+        self.supabase.table("ProjectLogs").upsert(
+            rows, on_conflict=IDEMPOTENCY_KEY_COLUMN, ignore_duplicates=True, returning="minimal"
+            ).execute()
+
+    def get_latest_update(self, project_code):
+        rows = (
+            self.supabase.table(LATEST_UPDATE_VIEW)
+            .select("created_at, submitter")
+            .eq("project_code", int(project_code))
+            .execute()
+            .data
+        )
+        return rows[0] if len(rows) > 0 else None
+
+    def get_logs(self, columns, after_id=None, limit=1000, project_code=None, project_codes=None):
+        query = self.supabase.table("ProjectLogs").select(", ".join(columns))
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        if project_code is not None:
+            query = query.eq("project_code", int(project_code))
+        if project_codes is not None:
+            query = query.in_("project_code", [int(code) for code in project_codes])
+        return query.order("id").limit(limit).execute().data
+
+    # Needs a key that is allowed to delete from ProjectLogs - see sql/project_logs_cohorts.sql
+    def delete_logs(self, ids):
+        ids = [int(log_id) for log_id in ids]
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            (
+                self.supabase.table("ProjectLogs")
+                .delete(returning="minimal")
+                .in_("id", ids[start:start + DELETE_BATCH_SIZE])
+                .execute()
+            )
+
+    def list_archives(self):
+        files = self.supabase.storage.from_(ARCHIVE_BUCKET).list(options={"limit": 1000})
+        return {file["name"]: file["updated_at"] for file in files}
+
+    # Needs a key that is allowed to write to the archive bucket - see sql/project_logs_cohorts.sql
+    def upload_archive(self, name, path):
+        self.supabase.storage.from_(ARCHIVE_BUCKET).upload(
+            name, Path(path).read_bytes(), {"upsert": "true", "content-type": "application/octet-stream"}
+            )
+
+    def download_archive(self, name, path):
+        Path(path).write_bytes(self.supabase.storage.from_(ARCHIVE_BUCKET).download(name))
+
+    def change_feed(self):
+        return self._change_feed
+
+
+# A stand-in backend that needs no network access or credentials - project logs are kept
+# in a local SQLite database, the project register is read from a CSV or Parquet file and
+# archive files are kept in the folder 'storage_dir'
+# Used for running the app offline and for load testing
+# Every call can be made to wait for 'delay' seconds first, to see how the app behaves on a slow connection
+class LocalBackend:
+
+    def __init__(self, db_path, register_path, delay=0, storage_dir=TRACKER_LOCAL_STORAGE):
+        self.register_path = Path(register_path)
+        self.delay = delay
+        self.storage_dir = Path(storage_dir)
+        self._change_feed = LocalChangeFeed()
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ProjectLogs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TEXT NOT NULL,
+                    project_code INTEGER NOT NULL,
+                    submitter TEXT,
+                    entry_type TEXT,
+                    entry TEXT
+                )
+                """)
+            # Databases created before submissions carried an idempotency key don't have the column
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(ProjectLogs)")]
+            if IDEMPOTENCY_KEY_COLUMN not in columns:
+                self._conn.execute(f"ALTER TABLE ProjectLogs ADD COLUMN {IDEMPOTENCY_KEY_COLUMN} TEXT")
+            self._conn.execute(f"""
+                CREATE UNIQUE INDEX IF NOT EXISTS projectlogs_idempotency_key_idx
+                ON ProjectLogs ({IDEMPOTENCY_KEY_COLUMN})
+                """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS projectlogs_project_code_created_at_idx
+                ON ProjectLogs (project_code, created_at DESC)
+                """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS projectlogs_project_code_id_idx
+                ON ProjectLogs (project_code, id)
+                """)
+
+    def _wait(self):
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def read_register(self):
+        self._wait()
+        if self.register_path.suffix == ".parquet":
+            return pd.read_parquet(self.register_path)
+        return pd.read_csv(self.register_path)
+
+    # Rows without an idempotency key (e.g. synthetic test data) are always written
+    # Once written, the rows are published to the change feed
+    def insert_logs(self, rows):
+        self._wait()
+        # Rows whose idempotency key is already stored are skipped, and aren't passed on to the
+        # change feed - just as Supabase realtime only sends the rows that were actually inserted
+        inserted = []
+        with self._lock, self._conn:
+            for row in rows:
+                cursor = self._conn.execute(
+                    f"""INSERT INTO ProjectLogs (created_at, project_code, submitter, entry_type, entry, {IDEMPOTENCY_KEY_COLUMN})
+                        VALUES (:created_at, :project_code, :submitter, :entry_type, :entry, :{IDEMPOTENCY_KEY_COLUMN})
+                        ON CONFLICT ({IDEMPOTENCY_KEY_COLUMN}) DO NOTHING""",
+                    {IDEMPOTENCY_KEY_COLUMN: None, **row}
+                    )
+                if cursor.rowcount > 0:
+                    inserted.append(row)
+        if inserted:
+            self._change_feed.publish(inserted)
+
+    def get_latest_update(self, project_code):
+        self._wait()
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT created_at, submitter FROM ProjectLogs
+                   WHERE project_code = ? ORDER BY created_at DESC LIMIT 1""",
+                (int(project_code),)
+                ).fetchone()
+        if row is None:
+            return None
+        return {"created_at": row[0], "submitter": row[1]}
+
+    def get_logs(self, columns, after_id=None, limit=1000, project_code=None, project_codes=None):
+        for column in columns:
+            if column not in LOG_COLUMNS:
+                raise ValueError(f"Unknown ProjectLogs column: {column}")
+        self._wait()
+
+        query = f"SELECT {', '.join(columns)} FROM ProjectLogs WHERE id > ?"
+        params = [after_id if after_id is not None else -1]
+        if project_code is not None:
+            query += " AND project_code = ?"
+            params.append(int(project_code))
+        if project_codes is not None:
+            query += f" AND project_code IN ({', '.join('?' * len(project_codes))})"
+            params += [int(code) for code in project_codes]
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def delete_logs(self, ids):
+        self._wait()
+        ids = [int(log_id) for log_id in ids]
+        with self._lock, self._conn:
+            for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                batch = ids[start:start + DELETE_BATCH_SIZE]
+                self._conn.execute(f"DELETE FROM ProjectLogs WHERE id IN ({', '.join('?' * len(batch))})", batch)
+
+    def list_archives(self):
+        self._wait()
+        if not self.storage_dir.exists():
+            return {}
+        return {path.name: str(path.stat().st_mtime_ns) for path in self.storage_dir.iterdir()
+                if path.is_file() and not path.name.startswith(".")}
+
+    # Copied under a temporary name and then moved into place, as Supabase Storage replaces a file in one go
+    def upload_archive(self, name, path):
+        self._wait()
+        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        uploading_path = self.storage_dir / f".{name}.uploading"
+        shutil.copyfile(path, uploading_path)
+        os.replace(uploading_path, self.storage_dir / name)
+
+    def download_archive(self, name, path):
+        self._wait()
+        shutil.copyfile(self.storage_dir / name, path)
+
+    def change_feed(self):
+        return self._change_feed
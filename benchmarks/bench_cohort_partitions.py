@@ -0,0 +1,118 @@
+# Benchmark of reading the project logs as closed cohorts build up year after year
+#
+# For each number of cohorts, fills a throwaway local stand-in backend with the same number of
+# synthetic projects and reports per cohort, then times the reads behind each interaction:
+#
+# - cohort logs: paging through the time, project, submitter and type of the logs, as the cohort dashboard does
+# - project logs: paging through one active project's full logs, as an export or portfolio does
+# - latest update: reading one active project's latest log, as choosing a project does
+#
+# Each is timed with every cohort's logs in one table and read unpartitioned, then partitioned by
+# cohort with the closed cohorts archived to Parquet and removed from the live table. Reading
+# a project from an archived cohort is timed too, along with the size of the archive files.
+#
+# Run from the repository root with:
+#     python benchmarks/bench_cohort_partitions.py [--cohorts 2 4 8] [--projects-per-cohort 40]
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backends import LOG_COLUMNS, LocalBackend
+from log_archive import LogArchive, PartitionedBackend, cohort_partitions
+from seed_local_backend import make_log_rows, make_register_df
+
+# Columns read for the cohort dashboard - matches data_access.LOG_HISTORY_COLUMNS
+LOG_HISTORY_COLUMNS = ["id", "created_at", "project_code", "submitter", "entry_type"]
+PAGE_SIZE = 1000
+
+
+def page_through(backend, columns, project_code=None):
+    after_id = None
+    rows = 0
+    while True:
+        page = backend.get_logs(columns, after_id=after_id, limit=PAGE_SIZE, project_code=project_code)
+        rows += len(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        after_id = page[-1]["id"]
+
+
+def median_ms(read, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = perf_counter()
+        read()
+        timings.append(perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def time_reads(backend, active_project, repeats):
+    return {
+        "cohort logs": median_ms(lambda: page_through(backend, LOG_HISTORY_COLUMNS), repeats),
+        "project logs": median_ms(lambda: page_through(backend, LOG_COLUMNS, project_code=active_project), repeats),
+        "latest update": median_ms(lambda: backend.get_latest_update(active_project), repeats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reading the project logs as closed cohorts build up")
+    parser.add_argument("--cohorts", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--projects-per-cohort", type=int, default=40)
+    parser.add_argument("--reports-per-cohort", type=int, default=4000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for n_cohorts in args.cohorts:
+        with tempfile.TemporaryDirectory() as work_dir:
+            register_df = make_register_df(n_cohorts * args.projects_per_cohort)
+            register_df["Cohort"] = (register_df["Project Code"] - 1) // args.projects_per_cohort + 1
+            partitions = cohort_partitions(register_df)
+
+            backend = LocalBackend(Path(work_dir) / "logs.db", Path(work_dir) / "register.csv",
+                                   storage_dir=Path(work_dir) / "storage")
+            for cohort in range(n_cohorts):
+                log_rows = make_log_rows(args.projects_per_cohort, args.reports_per_cohort, seed=cohort)
+                backend.insert_logs([{**row, "project_code": row["project_code"] + cohort * args.projects_per_cohort}
+                                     for row in log_rows])
+            total_rows = page_through(backend, ["id"])
+            active_project = max(partitions["active_project_codes"])
+            archived_project = 1
+
+            archive = LogArchive(backend, Path(work_dir) / "archive")
+            unpartitioned = time_reads(PartitionedBackend(backend, archive, lambda: None), active_project, args.repeats)
+
+            # Archive every closed cohort and take its logs out of the live table
+            for cohort, project_codes in partitions["cohort_projects"].items():
+                if cohort not in partitions["active_cohorts"]:
+                    cohort_rows = backend.get_logs(LOG_COLUMNS, limit=total_rows, project_codes=project_codes)
+                    archive.write_cohort(cohort, cohort_rows)
+                    backend.delete_logs([row["id"] for row in cohort_rows])
+            partitioned_backend = PartitionedBackend(backend, archive, lambda: partitions)
+            partitioned = time_reads(partitioned_backend, active_project, args.repeats)
+            archived = median_ms(lambda: page_through(partitioned_backend, LOG_COLUMNS, project_code=archived_project),
+                                 args.repeats)
+            archive_kb = sum(path.stat().st_size for path in backend.storage_dir.glob("*.parquet")) / 1024
+
+        results.append((n_cohorts, total_rows, unpartitioned, partitioned, archived, archive_kb))
+
+    reads = list(results[0][2])
+    print(f"Milliseconds per read (median of {args.repeats}), {args.projects_per_cohort} projects and "
+          f"{args.reports_per_cohort} reports per cohort")
+    print(f"{'cohorts':>8}{'log rows':>10}" + "".join(f"{read + ' (before/after)':>32}" for read in reads)
+          + f"{'archived project':>18}{'archive KB':>12}")
+    for n_cohorts, total_rows, unpartitioned, partitioned, archived, archive_kb in results:
+        print(f"{n_cohorts:>8}{total_rows:>10}"
+              + "".join(f"{f'{unpartitioned[read]:.1f} / {partitioned[read]:.1f}':>32}" for read in reads)
+              + f"{archived:>18.1f}{archive_kb:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
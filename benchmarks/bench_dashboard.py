@@ -0,0 +1,76 @@
+# Benchmark for the cohort dashboard aggregations on synthetic data
+#
+# Run from the repository root with:
+#     python benchmarks/bench_dashboard.py [--projects 5000] [--logs 50000]
+#
+# Exits with an error if the aggregations take longer than the time budget
+
+import argparse
+import sys
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cohort_stats import summarise_projects, monthly_report_counts, ENTRY_TYPES
+
+# The dashboard's aggregations should comfortably fit inside this many seconds
+TIME_BUDGET = 1.0
+
+
+def make_synthetic_data(n_projects, n_logs, seed=42):
+    rng = np.random.default_rng(seed)
+
+    project_codes = np.arange(1, n_projects + 1)
+    hsma_proj_reg_df = pd.DataFrame({
+        "Project Code": project_codes,
+        "Project Title": [f"Project {code}" for code in project_codes],
+        "Lead": [f"Lead {code}" for code in project_codes],
+    })
+    hsma_proj_reg_df["Full Project Title and Leads"] = (
+        hsma_proj_reg_df["Project Code"].astype("str") + ": " + hsma_proj_reg_df["Project Title"]
+        + " (" + hsma_proj_reg_df["Lead"] + ")"
+    )
+
+    # Leave some projects without any logs, as happens in a real cohort
+    logged_projects = rng.choice(project_codes, size=int(n_projects * 0.9), replace=False)
+    now = pd.Timestamp.now(tz="UTC")
+    log_history_df = pd.DataFrame({
+        "created_at": now - pd.to_timedelta(rng.integers(0, 2 * 365 * 24 * 60, size=n_logs), unit="min"),
+        "project_code": rng.choice(logged_projects, size=n_logs),
+        "entry_type": pd.Categorical(rng.choice(ENTRY_TYPES, size=n_logs), categories=ENTRY_TYPES),
+        # Reports of one to a few rows, as numbered by cohort_stats.ReportGrouper
+        "report": np.cumsum(rng.random(n_logs) < 0.4),
+    })
+    return hsma_proj_reg_df, log_history_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cohort dashboard aggregations on synthetic data")
+    parser.add_argument("--projects", type=int, default=5000)
+    parser.add_argument("--logs", type=int, default=50000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    hsma_proj_reg_df, log_history_df = make_synthetic_data(args.projects, args.logs)
+
+    timings = []
+    for _ in range(args.repeats):
+        start = perf_counter()
+        summarise_projects(hsma_proj_reg_df, log_history_df)
+        monthly_report_counts(log_history_df)
+        timings.append(perf_counter() - start)
+
+    median = float(np.median(timings))
+    print(f"{args.projects} projects, {args.logs} logs: "
+          f"median {median * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms over {args.repeats} runs")
+
+    if median > TIME_BUDGET:
+        sys.exit(f"Dashboard aggregations took {median:.2f}s - over the {TIME_BUDGET}s budget")
+
+
+if __name__ == "__main__":
+    main()
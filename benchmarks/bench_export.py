@@ -0,0 +1,53 @@
+# Benchmark of the log export's memory use as the log history grows
+#
+# Fills throwaway local stand-in backends with increasingly large synthetic log histories,
+# exports the whole cohort in each format, and records the time taken, the size of the file
+# and the peak memory allocated while writing it. Peak memory should stay roughly flat
+# however large the history gets.
+#
+# Run from the repository root with:
+#     python benchmarks/bench_export.py [--reports 1000 10000 100000]
+
+import argparse
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backends import LocalBackend
+from log_export import write_export, EXPORT_FORMATS
+from seed_local_backend import make_register_df, make_log_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark log export memory use against history size")
+    parser.add_argument("--reports", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--projects", type=int, default=200)
+    args = parser.parse_args()
+
+    register_df = make_register_df(args.projects)
+    project_titles = dict(zip(register_df["Project Code"], register_df["Project Title"]))
+
+    print(f"{'Reports':>10}{'Format':>10}{'Seconds':>10}{'File (MB)':>12}{'Peak memory (MB)':>19}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_reports in args.reports:
+            backend = LocalBackend(Path(work_dir) / f"logs_{n_reports}.db", Path(work_dir) / "register.csv")
+            backend.insert_logs(make_log_rows(args.projects, n_reports))
+
+            for export_format in EXPORT_FORMATS:
+                with tempfile.TemporaryFile() as export_file:
+                    tracemalloc.start()
+                    start = perf_counter()
+                    write_export(export_file, export_format, backend, project_titles)
+                    seconds = perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    print(f"{n_reports:>10}{export_format:>10}{seconds:>10.2f}"
+                          f"{export_file.tell() / 1024 ** 2:>12.2f}{peak / 1024 ** 2:>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
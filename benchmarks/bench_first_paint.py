@@ -0,0 +1,107 @@
+# Benchmark of how soon each part of the main page is drawn when the backend is slow to answer
+#
+# Runs app.py with Streamlit's AppTest against a throwaway local stand-in backend that waits
+# before answering every call (TRACKER_LOCAL_DELAY), to mimic the round trips to Google Sheets
+# and Supabase. Each repeat starts a fresh process with no copy of the project register on disk,
+# and measures two runs:
+#
+# - first visit: a cold start, where the project register has to be fetched
+# - project chosen: choosing a project, whose 'last updated' status has to be read (AppTest reruns
+#   the whole page for this, where the app itself only reruns the project picker)
+#
+# For each it reports how far into the run the header, the two forms and the project picker were drawn.
+#
+# Run from the repository root with:
+#     python benchmarks/bench_first_paint.py [--delay 0.5] [--repeats 5]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+MARKS = ["header_drawn", "forms_drawn", "project_picker_drawn"]
+
+RUNS_SCRIPT = """
+import json, os, sys
+sys.path.insert(0, sys.argv[1])
+os.chdir(sys.argv[1])
+from streamlit.testing.v1 import AppTest
+import instrumentation
+
+def last_script_run():
+    rerun = next(rerun for rerun in instrumentation.get_recent_reruns() if rerun["kind"] == "script")
+    return {**{mark: rerun["marks_ms"][mark] for mark in sys.argv[2:]}, "run_ms": rerun["total_ms"]}
+
+at = AppTest.from_file(os.path.join(sys.argv[1], "app.py"), default_timeout=60)
+at.run()
+first_visit = last_script_run()
+
+at.selectbox[0].select(at.selectbox[0].options[1]).run()
+project_chosen = last_script_run()
+print(json.dumps({"first_visit": first_visit, "project_chosen": project_chosen}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time how soon each part of the main page is drawn on a slow backend")
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds the stand-in backend waits on every call")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default="first_paint_results.json")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+    from seed_local_backend import make_register_df, make_log_rows
+    from backends import LocalBackend
+
+    runs = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        register_path = Path(work_dir) / "project_register.csv"
+        make_register_df(200).to_csv(register_path, index=False)
+        LocalBackend(Path(work_dir) / "project_logs.db", register_path).insert_logs(make_log_rows(200, 2000))
+        register_cache_path = Path(work_dir) / "project_register_cache.parquet"
+
+        env = {
+            **os.environ,
+            "TRACKER_BACKEND": "local",
+            "TRACKER_LOCAL_DB": str(Path(work_dir) / "project_logs.db"),
+            "TRACKER_LOCAL_REGISTER": str(register_path),
+            "TRACKER_LOCAL_DELAY": str(args.delay),
+            "TRACKER_REGISTER_CACHE": str(register_cache_path),
+            "TRACKER_OUTBOX_DB": str(Path(work_dir) / "outbox.db"),
+            "TRACKER_DRAFTS_DB": str(Path(work_dir) / "drafts.db"),
+            "TRACKER_SEARCH_INDEX": str(Path(work_dir) / "search_index.db"),
+            "TRACKER_LOCAL_STORAGE": str(Path(work_dir) / "local_storage"),
+            "TRACKER_LOG_ARCHIVE": str(Path(work_dir) / "log_archive"),
+            "TRACKER_PORTFOLIO_CACHE": str(Path(work_dir) / "portfolio_cache"),
+        }
+        for _ in range(args.repeats):
+            # No copy of the register on disk, so the cold start has to fetch it
+            register_cache_path.unlink(missing_ok=True)
+            output = subprocess.run([sys.executable, "-c", RUNS_SCRIPT, str(REPO_ROOT), *MARKS],
+                                    capture_output=True, text=True, env=env, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    results = {
+        scenario: {measure: round(float(np.median([run[scenario][measure] for run in runs])), 1)
+                   for measure in runs[0][scenario]}
+        for scenario in runs[0]
+    }
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "median_ms": results}, f, indent=2)
+
+    print(f"Milliseconds into the run (median of {args.repeats} fresh processes, {args.delay}s per backend call)")
+    print(f"{'':<24}" + "".join(f"{measure:>22}" for measure in MARKS + ["run_ms"]))
+    for scenario, result in results.items():
+        print(f"{scenario:<24}" + "".join(f"{result[measure]:>22.1f}" for measure in MARKS + ["run_ms"]))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Benchmark of server CPU per interaction with the page split into fragments
+#
+# Before the page was split into fragments, every interaction (choosing a project, typing a
+# name, typing an update) reran the whole of app.py. Now each interaction only reruns the
+# fragment it happened in. This runs the app with Streamlit's AppTest against the local
+# stand-in backend, and compares the CPU time of a whole-page rerun with the CPU time spent
+# in the fragment each interaction belongs to.
+#
+# AppTest always reruns the whole script, so the fragment figures come from the timing spans
+# around each fragment - they leave out Streamlit's own fixed cost per rerun, which is the
+# same either way.
+#
+# Run from the repository root with:
+#     python benchmarks/bench_fragments.py [--repeats 20] [--output fragment_cpu_results.json]
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Point the app at a throwaway local backend before anything reads the settings
+WORK_DIR = Path(tempfile.mkdtemp(prefix="tracker_fragment_bench_"))
+os.environ["TRACKER_BACKEND"] = "local"
+os.environ["TRACKER_LOCAL_DB"] = str(WORK_DIR / "project_logs.db")
+os.environ["TRACKER_LOCAL_REGISTER"] = str(WORK_DIR / "project_register.csv")
+os.environ["TRACKER_REGISTER_CACHE"] = str(WORK_DIR / "project_register_cache.parquet")
+os.environ["TRACKER_OUTBOX_DB"] = str(WORK_DIR / "outbox.db")
+os.environ["TRACKER_DRAFTS_DB"] = str(WORK_DIR / "drafts.db")
+os.environ["TRACKER_SEARCH_INDEX"] = str(WORK_DIR / "search_index.db")
+os.environ["TRACKER_LOCAL_STORAGE"] = str(WORK_DIR / "local_storage")
+os.environ["TRACKER_LOG_ARCHIVE"] = str(WORK_DIR / "log_archive")
+os.environ["TRACKER_PORTFOLIO_CACHE"] = str(WORK_DIR / "portfolio_cache")
+
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from streamlit.testing.v1 import AppTest
+
+import backends
+import instrumentation
+from seed_local_backend import make_register_df, make_log_rows
+
+# Each interaction, and the fragment that now reruns when it happens
+INTERACTIONS = {
+    "select_project": "project_picker_f",
+    "enter_name": "submitter_f",
+    "type_simple_update": "project_form_simple_f",
+    "type_structured_update": "project_form_structured_f",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CPU per interaction for whole-page and fragment reruns")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--reports", type=int, default=5000)
+    parser.add_argument("--output", default="fragment_cpu_results.json")
+    args = parser.parse_args()
+
+    make_register_df(args.projects).to_csv(os.environ["TRACKER_LOCAL_REGISTER"], index=False)
+    backends.LocalBackend(os.environ["TRACKER_LOCAL_DB"], os.environ["TRACKER_LOCAL_REGISTER"]).insert_logs(
+        make_log_rows(args.projects, args.reports)
+        )
+
+    # The app reads style.css and images relative to the working directory
+    os.chdir(REPO_ROOT)
+
+    at = AppTest.from_file(str(REPO_ROOT / "app.py"), default_timeout=60)
+    at.run()
+
+    rng = np.random.default_rng(42)
+    cpu_ms = {interaction: {"whole_page": [], "fragment": []} for interaction in INTERACTIONS}
+
+    for repeat in range(args.repeats):
+        actions = {
+            "select_project": lambda: at.selectbox[0].select(
+                at.selectbox[0].options[int(rng.integers(1, len(at.selectbox[0].options)))]).run(),
+            "enter_name": lambda: at.text_input(key="submitter").input(f"Benchmark User {repeat}").run(),
+            "type_simple_update": lambda: at.text_area(key="simple_update").input(f"Simple update {repeat}").run(),
+            "type_structured_update": lambda: at.text_area(key="structured_progress").input(
+                f"Structured update {repeat}").run(),
+        }
+        for interaction, fragment in INTERACTIONS.items():
+            actions[interaction]()
+            rerun = next(rerun for rerun in instrumentation.get_recent_reruns()
+                         if rerun["kind"] == "script" and rerun["name"] == "app")
+            cpu_ms[interaction]["whole_page"].append(rerun["cpu_ms"])
+            cpu_ms[interaction]["fragment"].append(rerun["spans_cpu_ms"][fragment])
+
+    results = {}
+    for interaction, fragment in INTERACTIONS.items():
+        whole_page = float(np.median(cpu_ms[interaction]["whole_page"]))
+        fragment_only = float(np.median(cpu_ms[interaction]["fragment"]))
+        results[interaction] = {
+            "fragment": fragment,
+            "whole_page_cpu_ms": round(whole_page, 2),
+            "fragment_cpu_ms": round(fragment_only, 2),
+            "reduction_percent": round(100 * (1 - fragment_only / whole_page), 1),
+        }
+
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "median_cpu_per_interaction": results}, f, indent=2)
+
+    print(f"{'Interaction':<25}{'Whole page (ms)':>18}{'Fragment (ms)':>16}{'Reduction':>12}")
+    for interaction, result in results.items():
+        print(f"{interaction:<25}{result['whole_page_cpu_ms']:>18.1f}{result['fragment_cpu_ms']:>16.1f}"
+              f"{result['reduction_percent']:>11.1f}%")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Benchmark of rendering portfolio documents for a whole cohort at once, as at the end of the programme
+#
+# Fills a throwaway local stand-in backend with a synthetic log history (using the example updates
+# as the text of every entry), then asks for a portfolio of every project at the same moment. While
+# the portfolios are rendered, a heartbeat thread in this process - standing in for the Streamlit
+# server - wakes every few milliseconds and records how late it was, as every session's reruns would
+# be held up by the same amount.
+#
+# The portfolios are rendered twice with the same number of workers: by render threads inside this
+# process (as rendering on the server would), and by PortfolioRenderer's separate render processes.
+# Asking again for every portfolio is timed too, which should be answered from the rendered files.
+#
+# Run from the repository root with:
+#     python benchmarks/bench_portfolio.py [--projects 30] [--reports 1200] [--format PDF]
+
+import argparse
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter, sleep
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from backends import LocalBackend
+from example_updates import SIMPLE_EXAMPLES
+from log_export import iter_log_rows, iter_reports
+from portfolio import PORTFOLIO_FORMATS, PORTFOLIO_RENDER_WORKERS, STATUS_RENDERING, PortfolioRenderer, render_portfolio
+from seed_local_backend import make_log_rows
+
+# How often (in seconds) the heartbeat thread wakes up
+HEARTBEAT_INTERVAL = 0.005
+
+
+# Records how late each wake-up of a thread sleeping HEARTBEAT_INTERVAL at a time is, until stopped
+class Heartbeat:
+
+    def __init__(self):
+        self.lateness = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = perf_counter()
+            sleep(HEARTBEAT_INTERVAL)
+            self.lateness.append(perf_counter() - start - HEARTBEAT_INTERVAL)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return np.array(self.lateness) * 1000
+
+
+def render_in_threads(backend, project_codes, portfolio_format, out_dir, workers):
+    def render(project_code):
+        reports = list(iter_reports(iter_log_rows(backend, project_code=project_code)))
+        render_portfolio(str(Path(out_dir) / f"project_{project_code}{PORTFOLIO_FORMATS[portfolio_format]}"),
+                         portfolio_format, f"Project {project_code}", reports)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(render, project_codes))
+
+
+def render_in_processes(renderer, project_codes, portfolio_format, latest_created_at):
+    jobs = [renderer.request(project_code, f"Project {project_code}", portfolio_format, latest_created_at[project_code])
+            for project_code in project_codes]
+    while any(renderer.get_status(job)["status"] == STATUS_RENDERING for job in jobs):
+        sleep(0.05)
+    return jobs
+
+
+def timed_with_heartbeat(render):
+    heartbeat = Heartbeat()
+    start = perf_counter()
+    render()
+    seconds = perf_counter() - start
+    lateness_ms = heartbeat.stop()
+    return {"seconds": seconds, "p99_ms": float(np.percentile(lateness_ms, 99)), "max_ms": float(lateness_ms.max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rendering a portfolio for every project in a cohort at once")
+    parser.add_argument("--projects", type=int, default=30)
+    parser.add_argument("--reports", type=int, default=1200, help="reports across the whole cohort")
+    parser.add_argument("--format", choices=list(PORTFOLIO_FORMATS), default="PDF")
+    parser.add_argument("--workers", type=int, default=PORTFOLIO_RENDER_WORKERS)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    log_rows = [{**row, "entry": str(rng.choice(SIMPLE_EXAMPLES))} for row in make_log_rows(args.projects, args.reports)]
+    project_codes = sorted({row["project_code"] for row in log_rows})
+    latest_created_at = {}
+    for row in log_rows:
+        latest_created_at[row["project_code"]] = max(row["created_at"], latest_created_at.get(row["project_code"], ""))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        backend = LocalBackend(Path(work_dir) / "logs.db", Path(work_dir) / "register.csv")
+        backend.insert_logs(log_rows)
+        (Path(work_dir) / "threads").mkdir()
+        renderer = PortfolioRenderer(backend, cache_dir=Path(work_dir) / "portfolios", max_workers=args.workers)
+
+        idle = timed_with_heartbeat(lambda: sleep(2))
+        in_threads = timed_with_heartbeat(
+            lambda: render_in_threads(backend, project_codes, args.format, Path(work_dir) / "threads", args.workers))
+        in_processes = timed_with_heartbeat(
+            lambda: render_in_processes(renderer, project_codes, args.format, latest_created_at))
+
+        start = perf_counter()
+        render_in_processes(renderer, project_codes, args.format, latest_created_at)
+        cached_ms = (perf_counter() - start) * 1000
+
+    print(f"{len(project_codes)} {args.format} portfolios ({args.reports} reports) rendered by {args.workers} workers")
+    print(f"{'':<28}{'total (s)':>12}{'heartbeat p99 late (ms)':>26}{'max late (ms)':>16}")
+    for name, result in [("nothing rendering", idle), ("render threads in server", in_threads),
+                         ("render processes", in_processes)]:
+        print(f"{name:<28}{result['seconds']:>12.2f}{result['p99_ms']:>26.1f}{result['max_ms']:>16.1f}")
+    print(f"Asking again for every portfolio, with no new logs: {cached_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
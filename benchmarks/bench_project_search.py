@@ -0,0 +1,127 @@
+# Benchmark for the project search box on a large synthetic project register
+#
+# Builds the register (and its search index) from synthetic projects with titles and leads made
+# up of realistic words, then types a mix of searches one character at a time - a project code,
+# words from a title, a lead's surname, and two words together - timing the search after each
+# keystroke. For comparison it also times a plain scan of every label for each keystroke, as the
+# dropdown's own filtering did, and reports the size of the dropdown options sent to the browser
+# with the whole register against the best matches only.
+#
+# Run from the repository root with:
+#     python benchmarks/bench_project_search.py [--projects 10000]
+#
+# Exits with an error if the 95th percentile keystroke takes longer than the time budget
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_access import build_proj_register, PROJECT_PLACEHOLDER
+
+# Each keystroke's search should comfortably fit inside this many seconds
+TIME_BUDGET = 0.01
+
+# Matches the number of projects the app offers in the dropdown
+RESULTS = 50
+
+TITLE_WORDS = [
+    "simulation", "modelling", "forecasting", "demand", "capacity", "emergency", "department", "patient",
+    "flow", "bed", "occupancy", "waiting", "list", "discharge", "ambulance", "handover", "mental", "health",
+    "community", "primary", "care", "outpatient", "theatre", "scheduling", "workforce", "planning",
+    "dashboard", "streamlit", "app", "machine", "learning", "prediction", "readmission", "frailty",
+    "stroke", "pathway", "cancer", "screening", "diagnostics", "radiology", "maternity", "paediatric",
+    "urgent", "elective", "recovery", "backlog", "geographic", "analysis", "inequalities", "population",
+    "segmentation", "discrete", "event", "agent", "based", "system", "dynamics", "optimisation", "routing",
+    "clinic", "appointments", "did", "not", "attend", "prevention", "falls", "dementia", "virtual", "ward",
+]
+FIRST_NAMES = [
+    "Sarah", "Dan", "Amy", "Tom", "Priya", "Mohammed", "Emma", "James", "Olivia", "Hassan", "Chloe", "Ben",
+    "Aisha", "Jack", "Fatima", "Liam", "Grace", "Oliver", "Sophie", "Raj", "Hannah", "Sam", "Zara", "Josh",
+]
+SURNAMES = [
+    "Chalk", "Smith", "Jones", "Patel", "Khan", "Williams", "Brown", "Taylor", "Davies", "Evans", "Wilson",
+    "Thomas", "Roberts", "Johnson", "Walker", "Wright", "Robinson", "Thompson", "White", "Hughes", "Edwards",
+    "Green", "Hall", "Wood", "Harris", "Lewis", "Martin", "Jackson", "Clarke", "Clark", "Turner", "Hill",
+    "Scott", "Cooper", "Morris", "Ward", "Moore", "King", "Watson", "Baker", "Harrison", "Morgan", "Ahmed",
+]
+
+
+def make_register_df(n_projects, seed=42):
+    rng = np.random.default_rng(seed)
+    project_codes = np.arange(1, n_projects + 1)
+
+    def lead_names():
+        n_leads = int(rng.integers(1, 4))
+        return ", ".join(f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}" for _ in range(n_leads))
+
+    return pd.DataFrame({
+        "Project Code": project_codes,
+        "Project Title": [" ".join(rng.choice(TITLE_WORDS, size=int(rng.integers(3, 8)))).capitalize()
+                          for _ in project_codes],
+        "Lead": [lead_names() for _ in project_codes],
+    })
+
+
+# Every prefix of each search, as it would be sent after each keystroke
+def keystrokes(searches):
+    return [search[:length] for search in searches for length in range(1, len(search) + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the project search box on a large synthetic register")
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    register_df = make_register_df(args.projects)
+
+    start = perf_counter()
+    proj_register = build_proj_register(register_df)
+    print(f"Built the register and search index for {args.projects} projects in {perf_counter() - start:.2f}s")
+    search_index = proj_register["search_index"]
+    labels = proj_register["project_list"][1:]
+
+    searches = [
+        str(args.projects // 3), "simulation", "bed occupancy", "patel", "mental health community",
+        "sarah chalk", "discharge", "ward virt", "khan stroke", "optimis",
+    ]
+    typed = keystrokes(searches)
+
+    index_timings = []
+    scan_timings = []
+    for _ in range(args.repeats):
+        for text in typed:
+            start = perf_counter()
+            search_index.search(text, limit=RESULTS)
+            index_timings.append(perf_counter() - start)
+
+            start = perf_counter()
+            lowered = text.lower()
+            [label for label in labels if lowered in label.lower()]
+            scan_timings.append(perf_counter() - start)
+
+    for name, timings in [("Search index", index_timings), ("Scan of every label", scan_timings)]:
+        timings_ms = np.array(timings) * 1000
+        print(f"{name:<20} {len(timings)} keystrokes: median {np.median(timings_ms):.2f} ms, "
+              f"p95 {np.percentile(timings_ms, 95):.2f} ms, max {timings_ms.max():.2f} ms")
+
+    full_options = json.dumps(proj_register["project_list"]).encode()
+    best_options = [json.dumps([PROJECT_PLACEHOLDER] + search_index.search(text, limit=RESULTS)[0]).encode()
+                    for text in typed]
+    print(f"Dropdown options sent to the browser: {len(full_options) / 1024:.0f} KB for the whole register, "
+          f"at most {max(len(options) for options in best_options) / 1024:.1f} KB for the best {RESULTS} matches")
+
+    p95 = float(np.percentile(np.array(index_timings) * 1000, 95))
+    if p95 > TIME_BUDGET * 1000:
+        sys.exit(f"95th percentile keystroke took {p95:.2f} ms - over the {TIME_BUDGET * 1000:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
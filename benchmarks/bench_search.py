@@ -0,0 +1,105 @@
+# Benchmark for the local full-text search index on synthetic logs
+#
+# Fills a throwaway local stand-in backend with synthetic log entries made up of common
+# project-update phrases, builds the search index from it, then times an incremental update
+# and a mix of searches with and without filters.
+#
+# Run from the repository root with:
+#     python benchmarks/bench_search.py [--entries 50000]
+#
+# Exits with an error if the 95th percentile search takes longer than the time budget
+
+import argparse
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backends import LocalBackend
+from cohort_stats import ENTRY_TYPES
+from search_index import SearchIndex
+
+# Searches should comfortably fit inside this many seconds
+TIME_BUDGET = 0.1
+
+PHRASES = [
+    "waiting for data access", "data quality issues", "met with stakeholders", "expert panel",
+    "exploratory data analysis", "discrete event simulation", "conceptual model", "information governance",
+    "annual leave", "ad-hoc requests", "published our code on GitHub", "literature review",
+    "emergency department", "patient flow", "bed occupancy", "forecasting demand", "Streamlit app",
+    "presented to the board", "validation of the model", "waiting list", "clinical coding",
+    "machine learning", "dashboard", "next month we will", "blocked by", "positive feedback",
+]
+
+QUERIES = ['"data access"', "stakeholders", "model validation", "simulat*", "waiting list blocked",
+           "governance", '"expert panel" feedback', "dashboard"]
+
+
+def make_entries(n_entries, n_projects, start_id=0, seed=42):
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "created_at": (now - timedelta(minutes=int(rng.integers(0, 2 * 365 * 24 * 60)))).isoformat(),
+            "project_code": int(rng.integers(1, n_projects + 1)),
+            "submitter": f"Trainee {int(rng.integers(1, 500))}",
+            "entry_type": str(rng.choice(ENTRY_TYPES)),
+            "entry": ". ".join(
+                f"Update {start_id + n} mentions {phrase}" for phrase in rng.choice(PHRASES, size=int(rng.integers(3, 12)))
+                ),
+        }
+        for n in range(n_entries)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local full-text search index on synthetic logs")
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        backend = LocalBackend(Path(work_dir) / "logs.db", Path(work_dir) / "register.csv")
+        backend.insert_logs(make_entries(args.entries, args.projects))
+        search_index = SearchIndex(Path(work_dir) / "search_index.db")
+
+        start = perf_counter()
+        search_index.update(backend)
+        print(f"Indexed {search_index.indexed_count()} entries in {perf_counter() - start:.2f}s")
+
+        backend.insert_logs(make_entries(100, args.projects, start_id=args.entries, seed=1))
+        start = perf_counter()
+        added = search_index.update(backend)
+        print(f"Incremental update of {added} new entries took {(perf_counter() - start) * 1000:.1f} ms")
+
+        filters = [
+            {},
+            {"entry_types": ["Structured Log - Challenges"]},
+            {"project_codes": list(range(1, 21))},
+            {"start": (datetime.now(timezone.utc) - timedelta(days=90)).isoformat()},
+        ]
+        timings = []
+        for _ in range(args.repeats):
+            for query in QUERIES:
+                for search_filter in filters:
+                    start = perf_counter()
+                    search_index.search(query, **search_filter)
+                    timings.append(perf_counter() - start)
+
+    timings_ms = np.array(timings) * 1000
+    p95 = float(np.percentile(timings_ms, 95))
+    print(f"{len(timings)} searches: median {np.median(timings_ms):.1f} ms, "
+          f"p95 {p95:.1f} ms, max {timings_ms.max():.1f} ms")
+
+    if p95 > TIME_BUDGET * 1000:
+        sys.exit(f"95th percentile search took {p95:.1f} ms - over the {TIME_BUDGET * 1000:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
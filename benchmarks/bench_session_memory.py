@@ -0,0 +1,112 @@
+# Benchmark of memory per dashboard session as the number of logs grows
+#
+# The log history behind the cohort dashboard is held once per process and shared by every
+# session. For each log volume this fills a throwaway local stand-in backend, then in a fresh
+# process (so nothing is cached from the previous volume) opens dashboard sessions one after
+# another with Streamlit's AppTest, keeping them all open, and records:
+#
+# - the size of the shared log history dataframe
+# - the memory each extra open session holds on to
+# - the peak memory allocated while a session runs the page
+#
+# The shared copy grows with the number of logs, while the memory each session holds on to
+# should stay flat.
+#
+# Run from the repository root with:
+#     python benchmarks/bench_session_memory.py [--reports 2000 20000 100000] [--sessions 10]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+SESSIONS_SCRIPT = """
+import gc, json, os, sys, tracemalloc
+sys.path.insert(0, sys.argv[1])
+os.chdir(sys.argv[1])
+from streamlit.testing.v1 import AppTest
+import data_access
+
+def open_session():
+    at = AppTest.from_file(os.path.join(sys.argv[1], "pages", "Cohort_Dashboard.py"), default_timeout=120)
+    at.run()
+    return at
+
+# The first session loads the shared log history
+sessions = [open_session()]
+shared_bytes = int(data_access.get_log_history_df().memory_usage(deep=True).sum())
+
+gc.collect()
+tracemalloc.start()
+before = tracemalloc.get_traced_memory()[0]
+peaks = []
+for _ in range(int(sys.argv[2])):
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    sessions.append(open_session())
+    peaks.append(tracemalloc.get_traced_memory()[1] - start)
+gc.collect()
+retained = (tracemalloc.get_traced_memory()[0] - before) / int(sys.argv[2])
+print(json.dumps({"shared_log_history_mb": shared_bytes / 1024 ** 2,
+                  "retained_per_session_mb": retained / 1024 ** 2,
+                  "peak_per_session_run_mb": max(peaks) / 1024 ** 2}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per dashboard session against log volume")
+    parser.add_argument("--reports", type=int, nargs="+", default=[2000, 20000, 100000])
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--output", default="session_memory_results.json")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+    from seed_local_backend import make_register_df, make_log_rows
+    from backends import LocalBackend
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        register_path = Path(work_dir) / "project_register.csv"
+        make_register_df(args.projects).to_csv(register_path, index=False)
+
+        for n_reports in args.reports:
+            db_path = Path(work_dir) / f"project_logs_{n_reports}.db"
+            rows = make_log_rows(args.projects, n_reports)
+            LocalBackend(db_path, register_path).insert_logs(rows)
+
+            env = {
+                **os.environ,
+                "TRACKER_BACKEND": "local",
+                "TRACKER_LOCAL_DB": str(db_path),
+                "TRACKER_LOCAL_REGISTER": str(register_path),
+                "TRACKER_REGISTER_CACHE": str(Path(work_dir) / "project_register_cache.parquet"),
+                "TRACKER_OUTBOX_DB": str(Path(work_dir) / "outbox.db"),
+                "TRACKER_DRAFTS_DB": str(Path(work_dir) / "drafts.db"),
+                "TRACKER_SEARCH_INDEX": str(Path(work_dir) / "search_index.db"),
+                "TRACKER_LOCAL_STORAGE": str(Path(work_dir) / "local_storage"),
+                "TRACKER_LOG_ARCHIVE": str(Path(work_dir) / "log_archive"),
+                "TRACKER_PORTFOLIO_CACHE": str(Path(work_dir) / "portfolio_cache"),
+            }
+            output = subprocess.run([sys.executable, "-c", SESSIONS_SCRIPT, str(REPO_ROOT), str(args.sessions)],
+                                    capture_output=True, text=True, env=env, check=True).stdout
+            results[len(rows)] = {key: round(value, 3)
+                                  for key, value in json.loads(output.strip().splitlines()[-1]).items()}
+
+    with open(args.output, "w") as f:
+        json.dump({"config": vars(args), "by_log_rows": results}, f, indent=2)
+
+    print(f"{'Log rows':>10}{'Shared history (MB)':>22}{'Retained / session (MB)':>26}{'Peak / session run (MB)':>26}")
+    for log_rows, result in results.items():
+        print(f"{log_rows:>10}{result['shared_log_history_mb']:>22.2f}"
+              f"{result['retained_per_session_mb']:>26.3f}{result['peak_per_session_run_mb']:>26.2f}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# Load test for the tracker app
+#
+# Drives app.py headlessly with Streamlit's AppTest, simulating a cohort of users who each
+# pick a project, enter their name, write a quick or structured log and submit it, against
+# the local stand-in backend seeded with synthetic data.
+#
+# AppTest can't be run from several threads at once, so concurrent users are simulated by
+# keeping a number of sessions open and interleaving their interactions at random - they all
+# share the same process-wide caches, background queue and backend, as they would on a server.
+#
+# Run from the repository root with:
+#     python benchmarks/load_test.py [--sessions 60] [--concurrency 8] [--output load_test_results.json]
+#
+# Reports per-rerun latency percentiles (overall and per step), backend calls per rerun and
+# memory per session, and writes them to a JSON file so runs can be compared between versions
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter, sleep
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Point the app at a throwaway local backend before anything reads the settings
+WORK_DIR = Path(tempfile.mkdtemp(prefix="tracker_load_test_"))
+os.environ["TRACKER_BACKEND"] = "local"
+os.environ["TRACKER_LOCAL_DB"] = str(WORK_DIR / "project_logs.db")
+os.environ["TRACKER_LOCAL_REGISTER"] = str(WORK_DIR / "project_register.csv")
+os.environ["TRACKER_REGISTER_CACHE"] = str(WORK_DIR / "project_register_cache.parquet")
+os.environ["TRACKER_OUTBOX_DB"] = str(WORK_DIR / "outbox.db")
+os.environ["TRACKER_DRAFTS_DB"] = str(WORK_DIR / "drafts.db")
+os.environ["TRACKER_SEARCH_INDEX"] = str(WORK_DIR / "search_index.db")
+os.environ["TRACKER_LOCAL_STORAGE"] = str(WORK_DIR / "local_storage")
+os.environ["TRACKER_LOG_ARCHIVE"] = str(WORK_DIR / "log_archive")
+os.environ["TRACKER_PORTFOLIO_CACHE"] = str(WORK_DIR / "portfolio_cache")
+
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from streamlit.testing.v1 import AppTest
+
+import backends
+import data_access
+from seed_local_backend import make_register_df, make_log_rows
+
+PERCENTILES = [50, 90, 95, 99]
+
+STRUCTURED_KEYS = ["structured_progress", "structured_meetings", "structured_challenges",
+                   "structured_plans", "structured_other"]
+
+
+# Local backend that counts how often each method is called, so we can see
+# how many backend reads and writes each rerun causes
+class CountingBackend(backends.LocalBackend):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._count_lock = threading.Lock()
+        self.calls = {"read_register": 0, "get_latest_update": 0, "get_logs": 0, "insert_logs": 0}
+
+    def _count(self, method):
+        with self._count_lock:
+            self.calls[method] += 1
+
+    def total_reads(self):
+        with self._count_lock:
+            return self.calls["read_register"] + self.calls["get_latest_update"] + self.calls["get_logs"]
+
+    def read_register(self):
+        self._count("read_register")
+        return super().read_register()
+
+    def get_latest_update(self, project_code):
+        self._count("get_latest_update")
+        return super().get_latest_update(project_code)
+
+    def get_logs(self, *args, **kwargs):
+        self._count("get_logs")
+        return super().get_logs(*args, **kwargs)
+
+    def insert_logs(self, rows):
+        self._count("insert_logs")
+        return super().insert_logs(rows)
+
+
+def percentiles(values):
+    if len(values) == 0:
+        return {}
+    values_ms = np.array(values) * 1000
+    summary = {f"p{p}": round(float(np.percentile(values_ms, p)), 2) for p in PERCENTILES}
+    summary["mean"] = round(float(values_ms.mean()), 2)
+    summary["max"] = round(float(values_ms.max()), 2)
+    summary["count"] = len(values)
+    return summary
+
+
+# One simulated user working through the page, recording how long each rerun takes
+# Yields after each interaction so that other sessions can take a turn
+def run_session(session_number, rng, timings, counting_backend, timeout):
+    at = AppTest.from_file(str(REPO_ROOT / "app.py"), default_timeout=timeout)
+
+    def timed(step, action):
+        reads_before = counting_backend.total_reads()
+        start = perf_counter()
+        action()
+        timings.append({
+            "step": step,
+            "seconds": perf_counter() - start,
+            "backend_reads": counting_backend.total_reads() - reads_before,
+            "exception": len(at.exception) > 0
+        })
+
+    timed("initial_load", at.run)
+    yield
+
+    project_box = at.selectbox[0]
+    project = project_box.options[int(rng.integers(1, len(project_box.options)))]
+    timed("select_project", lambda: project_box.select(project).run())
+    yield
+
+    timed("enter_name", lambda: at.text_input(key="submitter").input(f"Load Test User {session_number}").run())
+    yield
+
+    if rng.random() < 0.5:
+        timed("type_update", lambda: at.text_area(key="simple_update").input(
+            f"Simple load test update from session {session_number}").run())
+        yield
+        submit_button = next(button for button in at.button if button.label == "Submit Update" and button.key is None)
+    else:
+        for key in STRUCTURED_KEYS[:int(rng.integers(1, len(STRUCTURED_KEYS) + 1))]:
+            timed("type_update", lambda key=key: at.text_area(key=key).input(
+                f"Structured load test {key} from session {session_number}").run())
+            yield
+        submit_button = at.button(key="submit_update_structured")
+
+    timed("submit", lambda: submit_button.click().run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the tracker app against the local stand-in backend")
+    parser.add_argument("--sessions", type=int, default=60, help="Number of simulated users")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of users with the page open at once")
+    parser.add_argument("--projects", type=int, default=200, help="Projects in the synthetic register")
+    parser.add_argument("--reports", type=int, default=5000, help="Existing reports in the synthetic log table")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds before a single rerun is treated as hung")
+    parser.add_argument("--output", default="load_test_results.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    make_register_df(args.projects).to_csv(os.environ["TRACKER_LOCAL_REGISTER"], index=False)
+    backends.LocalBackend(os.environ["TRACKER_LOCAL_DB"], os.environ["TRACKER_LOCAL_REGISTER"]).insert_logs(
+        make_log_rows(args.projects, args.reports)
+        )
+
+    # Have the app use a counting backend, and keep a handle on it
+    data_access.LocalBackend = CountingBackend
+    counting_backend = data_access.get_backend()
+
+    # The app reads style.css and images relative to the working directory
+    os.chdir(REPO_ROOT)
+
+    timings = []
+    rng = np.random.default_rng(42)
+    session_seeds = rng.integers(0, 2**32, size=args.sessions)
+
+    # Keep up to 'concurrency' sessions open at once, picking one at random for each interaction
+    waiting = [
+        run_session(n, np.random.default_rng(session_seeds[n]), timings, counting_backend, args.timeout)
+        for n in range(args.sessions)
+    ]
+    active = []
+
+    start = perf_counter()
+    while waiting or active:
+        while waiting and len(active) < args.concurrency:
+            active.append(waiting.pop(0))
+        session = active[int(rng.integers(0, len(active)))]
+        try:
+            next(session)
+        except StopIteration:
+            active.remove(session)
+    wall_time = perf_counter() - start
+
+    # Memory is measured separately, as tracing allocations slows everything down
+    # Open 'concurrency' fresh sessions, take each as far as typing an update, and see how
+    # much more memory is in use while they are all open
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    memory_sessions = [
+        run_session(args.sessions + n, np.random.default_rng(n), [], counting_backend, args.timeout)
+        for n in range(args.concurrency)
+    ]
+    for session in memory_sessions:
+        for _ in range(4):
+            next(session, None)
+    memory_per_session = (tracemalloc.get_traced_memory()[0] - memory_before) / args.concurrency
+    tracemalloc.stop()
+
+    # Give the background queue a moment to finish writing the submissions
+    for _ in range(100):
+        if counting_backend.calls["insert_logs"] >= args.sessions:
+            break
+        sleep(0.1)
+
+    try:
+        git_commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                    text=True, cwd=REPO_ROOT).stdout.strip()
+    except OSError:
+        git_commit = None
+
+    steps = sorted(set(timing["step"] for timing in timings))
+    results = {
+        "run_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit,
+        "config": vars(args),
+        "wall_time_seconds": round(wall_time, 2),
+        "reruns": percentiles([timing["seconds"] for timing in timings]),
+        "reruns_by_step": {
+            step: percentiles([timing["seconds"] for timing in timings if timing["step"] == step])
+            for step in steps
+        },
+        "backend_reads_per_rerun": round(float(np.mean([timing["backend_reads"] for timing in timings])), 3),
+        "backend_reads_by_step": {
+            step: round(float(np.mean([timing["backend_reads"] for timing in timings if timing["step"] == step])), 3)
+            for step in steps
+        },
+        "backend_calls": counting_backend.calls,
+        "reruns_with_exceptions": sum(timing["exception"] for timing in timings),
+        "memory_per_session_kb": round(memory_per_session / 1024, 1),
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+
+    print(json.dumps(results, indent=2, default=str))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
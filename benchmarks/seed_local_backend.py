@@ -0,0 +1,78 @@
+# Fill the local stand-in backend with a synthetic project register and project logs
+#
+# Run from the repository root with:
+#     python benchmarks/seed_local_backend.py [--projects 200] [--reports 2000]
+#
+# then start the app against it with:
+#     TRACKER_BACKEND=local streamlit run app.py
+
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backends import LocalBackend, TRACKER_LOCAL_DB, TRACKER_LOCAL_REGISTER
+from cohort_stats import ENTRY_TYPES
+
+STRUCTURED_ENTRY_TYPES = [entry_type for entry_type in ENTRY_TYPES if entry_type != "Simple Log"]
+
+
+def make_register_df(n_projects):
+    project_codes = np.arange(1, n_projects + 1)
+    return pd.DataFrame({
+        "Project Code": project_codes,
+        "Project Title": [f"Synthetic Project {code}" for code in project_codes],
+        "Lead": [f"Lead {code}" for code in project_codes],
+    })
+
+
+# Half the reports are simple logs, and half are structured logs with a progress entry
+# plus a random selection of the optional boxes, all sharing a created_at as in the app
+def make_log_rows(n_projects, n_reports, seed=42):
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    rows = []
+    for _ in range(n_reports):
+        report = {
+            "created_at": (now - timedelta(minutes=int(rng.integers(0, 365 * 24 * 60)))).isoformat(),
+            "project_code": int(rng.integers(1, n_projects + 1)),
+            "submitter": f"Trainee {int(rng.integers(1, 500))}",
+        }
+        if rng.random() < 0.5:
+            entry_types = ["Simple Log"]
+        else:
+            entry_types = [STRUCTURED_ENTRY_TYPES[0]] + [
+                entry_type for entry_type in STRUCTURED_ENTRY_TYPES[1:] if rng.random() < 0.5
+            ]
+        for entry_type in entry_types:
+            rows.append({**report, "entry_type": entry_type, "entry": f"Synthetic {entry_type.lower()} entry"})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the local stand-in backend with synthetic data")
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--reports", type=int, default=2000)
+    parser.add_argument("--db", default=TRACKER_LOCAL_DB)
+    parser.add_argument("--register", default=TRACKER_LOCAL_REGISTER)
+    args = parser.parse_args()
+
+    register_df = make_register_df(args.projects)
+    if args.register.endswith(".parquet"):
+        register_df.to_parquet(args.register, index=False)
+    else:
+        register_df.to_csv(args.register, index=False)
+
+    rows = make_log_rows(args.projects, args.reports)
+    LocalBackend(args.db, args.register).insert_logs(rows)
+
+    print(f"Wrote {args.projects} projects to {args.register} and {len(rows)} log rows to {args.db}")
+
+
+if __name__ == "__main__":
+    main()
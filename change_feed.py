@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import queue
+import threading
+from time import monotonic
+
+from instrumentation import log_event
+
+# Seconds to wait before reconnecting to Supabase realtime after losing the connection,
+# doubling after each failed attempt up to the maximum
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 60
+
+# How often (in seconds) the realtime connection is checked by sending a message the server has to
+# acknowledge - a connection the server has dropped or closed fails the check, and is started again
+LIVENESS_CHECK_INTERVAL = 30
+
+# Columns of each new row sent by Supabase realtime - what moving on a project's latest update needs,
+# leaving the log text behind
+FEED_COLUMNS = ["created_at", "project_code", "submitter"]
+
+
+# Feeds of log rows as they are written to the ProjectLogs table
+#
+# Every feed provides the same methods:
+#
+# subscribe(callback)  - call callback(rows) on a background thread with each batch of newly written log rows,
+#                        each row having at least the FEED_COLUMNS
+# live_since()         - when (by time.monotonic()) the feed last started passing on every new row, or None
+#                        while it isn't - anything read from the database since then is kept current by the feed
+
+
+# Hands each batch of rows to every subscriber on a single background thread, in the order they arrived
+class _Subscribers:
+
+    def __init__(self, name):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def add(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def deliver(self, rows):
+        self._queue.put(rows)
+
+    def _run(self):
+        while True:
+            rows = self._queue.get()
+            with self._lock:
+                callbacks = list(self._callbacks)
+            for callback in callbacks:
+                try:
+                    callback(rows)
+                except Exception as e:
+                    log_event("change_feed_callback_failed", level=logging.ERROR, error=str(e))
+
+
+# Stand-in for Supabase realtime used by the local backend - the backend publishes every batch
+# of rows it writes, and as everything runs in one process the feed never misses a row
+class LocalChangeFeed:
+
+    def __init__(self):
+        self._subscribers = _Subscribers("local-change-feed")
+        self._live_since = monotonic()
+
+    def subscribe(self, callback):
+        self._subscribers.add(callback)
+
+    def live_since(self):
+        return self._live_since
+
+    def publish(self, rows):
+        self._subscribers.deliver(rows)
+
+
+# Listens for rows inserted into ProjectLogs through Supabase realtime (see sql/project_logs_realtime.sql)
+# The synchronous Supabase client can't listen for changes, so the async realtime client is run
+# with an event loop of its own on a background thread, started by the first subscriber
+# Rows inserted while the connection is down aren't sent again, so live_since() is reset on reconnecting
+# Only the public realtime API is used - the connection is known to be up by its acknowledged checks
+class SupabaseChangeFeed:
+
+    def __init__(self, realtime_url, key, table="ProjectLogs"):
+        self.realtime_url = realtime_url
+        self.key = key
+        self.table = table
+
+        self._lock = threading.Lock()
+        self._subscribers = _Subscribers("supabase-change-feed")
+        self._live_since = None
+        self._listener = None
+
+    def subscribe(self, callback):
+        self._subscribers.add(callback)
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=asyncio.run, args=(self._listen(),),
+                                                  name="supabase-realtime", daemon=True)
+                self._listener.start()
+
+    def live_since(self):
+        with self._lock:
+            return self._live_since
+
+    def _set_live(self, is_live):
+        with self._lock:
+            self._live_since = monotonic() if is_live else None
+
+    def _on_insert(self, payload):
+        record = payload["data"].get("record")
+        if record is not None:
+            self._subscribers.deliver([record])
+
+    async def _listen(self):
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                await self._listen_until_dropped()
+                log_event("change_feed_disconnected", level=logging.WARNING)
+                delay = RECONNECT_DELAY
+            except (Exception, asyncio.CancelledError) as e:
+                log_event("change_feed_disconnected", level=logging.WARNING, error=str(e))
+            finally:
+                self._set_live(False)
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    # Connect and pass on new rows until the connection is lost
+    # Each connection has a client and a 'dropped' event of its own, so a late reply to a check sent on
+    # an earlier connection can't end this one
+    async def _listen_until_dropped(self):
+        # realtime is installed alongside supabase, and like it isn't imported until needed
+        from realtime import AsyncRealtimeClient, RealtimeAcknowledgementStatus, RealtimeSubscribeStates
+
+        client = AsyncRealtimeClient(self.realtime_url, token=self.key, auto_reconnect=False)
+        dropped = asyncio.Event()
+
+        def on_subscribe_state(state, error):
+            self._set_live(state == RealtimeSubscribeStates.SUBSCRIBED)
+            log_event("change_feed_state", state=state.value, error=None if error is None else str(error))
+            # Anything other than a successful subscription drops the connection, to start again
+            if state != RealtimeSubscribeStates.SUBSCRIBED:
+                dropped.set()
+
+        try:
+            await client.connect()
+            # Broadcasts on the channel are acknowledged, so one can be sent to check the connection
+            channel = client.channel(f"{self.table}-inserts", {"config": {
+                "broadcast": {"ack": True, "self": False},
+                "presence": {"key": "", "enabled": False},
+                "private": False,
+                }})
+            channel.on_postgres_changes("INSERT", schema="public", table=self.table, select=FEED_COLUMNS,
+                                        callback=self._on_insert)
+            await channel.subscribe(on_subscribe_state)
+
+            while not dropped.is_set():
+                try:
+                    await asyncio.wait_for(dropped.wait(), timeout=LIVENESS_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    # A channel that has left or errored since subscribing may have missed rows
+                    if not channel.is_joined:
+                        return
+                    check = await channel.push("broadcast", {"type": "broadcast", "event": "liveness_check",
+                                                             "payload": {}})
+                    check.receive(RealtimeAcknowledgementStatus.Error, lambda *args: dropped.set())
+                    check.receive(RealtimeAcknowledgementStatus.Timeout, lambda *args: dropped.set())
+        finally:
+            try:
+                await client.close()
+            except Exception:
+                pass
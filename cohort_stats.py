@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+# Projects with no update for at least this many days are flagged as having gone quiet
+QUIET_AFTER_DAYS = 30
+
+# The types of entry a log row can have - used to give every project the same set of mix columns
+ENTRY_TYPES = [
+    "Simple Log",
+    "Structured Log - Progress",
+    "Structured Log - Meetings",
+    "Structured Log - Challenges",
+    "Structured Log - Planned Activities",
+    "Structured Log - Other Comments",
+]
+
+# Boxes of a structured log used to be written one insert at a time, each with its own created_at a
+# moment after the last - rows for the same project and submitter this close together are one report
+REPORT_TIME_TOLERANCE = pd.Timedelta(seconds=60)
+# Most reports that are still open to more rows at once - others are closed oldest first
+MAX_OPEN_REPORTS = 50
+
+
+# Numbers each log row, taken in id order, with the report it was submitted as
+# A report is a Simple Log on its own, or boxes of a structured log for the same project and submitter,
+# in the order of ENTRY_TYPES, each written within REPORT_TIME_TOLERANCE of the one before
+# Other logs written at the same time can come between a report's rows in id order, so a few reports
+# are kept open at once - take_closed() hands back those no later row can join, in the order they began
+class ReportGrouper:
+
+    def __init__(self):
+        self.report_count = 0
+        # [report number, project code, submitter, created_at and entry type position of its last row]
+        self._open = []
+        self._closed = []
+
+    def add(self, project_code, submitter, created_at, entry_type):
+        # Compared as whole nanoseconds, which is much quicker than comparing Timestamps
+        created_at = pd.Timestamp(created_at).value
+        tolerance = REPORT_TIME_TOLERANCE.value
+        position = ENTRY_TYPES.index(entry_type) if entry_type in ENTRY_TYPES else -1
+
+        report = None
+        if position > 0:
+            for open_report in reversed(self._open):
+                if (open_report[1] == project_code and open_report[2] == submitter
+                        and 0 < open_report[4] < position
+                        and abs(created_at - open_report[3]) <= tolerance):
+                    report = open_report
+                    break
+        if report is None:
+            report = [self.report_count, project_code, submitter, created_at, position]
+            self.report_count += 1
+            self._open.append(report)
+        else:
+            report[3] = max(report[3], created_at)
+            report[4] = position
+
+        while self._open and (len(self._open) > MAX_OPEN_REPORTS
+                              or created_at - self._open[0][3] > tolerance):
+            self._closed.append(self._open.pop(0)[0])
+        return report[0]
+
+    # Numbers of the reports closed since the last call - with final=True, every report is closed
+    def take_closed(self, final=False):
+        if final:
+            self._closed += [report[0] for report in self._open]
+            self._open = []
+        closed, self._closed = self._closed, []
+        return closed
+
+
+# One row per report - the first row of each, from the report numbers given by ReportGrouper
+def get_reports_df(log_history_df):
+    return log_history_df.drop_duplicates("report")
+
+# One row per project in the register with the time of its last update, how many days ago that was,
+# how many reports and log entries it has, and how many entries of each type
+# Projects with no logs are kept, with no last update and counts of zero
+def summarise_projects(hsma_proj_reg_df, log_history_df, now=None):
+    if now is None:
+        now = pd.Timestamp.now(tz="UTC")
+
+    by_project = log_history_df.groupby("project_code", sort=False)
+    log_summary = pd.DataFrame({
+        "Last Update": by_project["created_at"].max(),
+        "Reports": get_reports_df(log_history_df).groupby("project_code", sort=False).size(),
+        "Log Entries": by_project.size(),
+    })
+
+    # Counts of each entry type per project, as one column per type
+    entry_type_mix = (
+        log_history_df.groupby(["project_code", "entry_type"], observed=True)
+        .size()
+        .unstack(fill_value=0)
+        .reindex(columns=ENTRY_TYPES, fill_value=0)
+    )
+    log_summary = log_summary.join(entry_type_mix)
+
+    project_codes = pd.to_numeric(hsma_proj_reg_df["Project Code"], errors="coerce")
+    project_summary = (
+        hsma_proj_reg_df[["Full Project Title and Leads"]]
+        .assign(project_code=project_codes)
+        .merge(log_summary, how="left", left_on="project_code", right_index=True)
+    )
+
+    count_columns = ["Reports", "Log Entries"] + ENTRY_TYPES
+    project_summary[count_columns] = project_summary[count_columns].fillna(0).astype("int64")
+
+    # Whole days since the last update - NaN for projects that have never been updated
+    days_since = (now - project_summary["Last Update"]) / np.timedelta64(1, "D")
+    project_summary["Days Since Update"] = np.floor(days_since)
+    project_summary["Gone Quiet"] = project_summary["Days Since Update"].isna() | (project_summary["Days Since Update"] >= QUIET_AFTER_DAYS)
+
+    return project_summary.sort_values("Days Since Update", ascending=False, na_position="first")
+
+# Number of reports submitted for each project in each calendar month, with projects as rows
+# and months as columns
+def monthly_report_counts(log_history_df):
+    reports_df = get_reports_df(log_history_df)
+    # Truncate timestamps to the month with NumPy rather than going via Period objects
+    months = reports_df["created_at"].dt.tz_convert(None).to_numpy().astype("datetime64[M]")
+    return (
+        pd.DataFrame({"project_code": reports_df["project_code"].to_numpy(), "Month": months})
+        .groupby(["project_code", "Month"])
+        .size()
+        .unstack(fill_value=0)
+    )
@@ -0,0 +1,300 @@
+import logging
+import os
+import streamlit as st
+import pandas as pd
+from time import monotonic, perf_counter
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import InstrumentedBackend, carry_rerun, log_event, span, timed
+from search_index import SearchIndex
+from project_search import ProjectSearchIndex
+from portfolio import PortfolioRenderer
+from cohort_stats import ReportGrouper
+from log_archive import LogArchive, PartitionedBackend, cohort_partitions
+from backends import SupabaseBackend, LocalBackend, TRACKER_BACKEND, TRACKER_LOCAL_DB, TRACKER_LOCAL_REGISTER, TRACKER_LOCAL_DELAY
+
+# The Supabase and Google Sheets client libraries take around a second to import between them, so
+# they aren't imported until a connection is made - and unless the app is running against the local
+# stand-in, a background thread starts importing them straight away so they are ready when needed
+def _import_client_libraries():
+    from supabase import create_client
+    from streamlit_gsheets import GSheetsConnection
+    return create_client, GSheetsConnection
+
+def _warm_client_libraries():
+    start = perf_counter()
+    try:
+        _import_client_libraries()
+        log_event("client_libraries_imported", seconds=round(perf_counter() - start, 3))
+    except Exception as e:
+        log_event("client_library_import_failed", level=logging.WARNING, error=str(e))
+
+if TRACKER_BACKEND != "local":
+    threading.Thread(target=_warm_client_libraries, name="client-library-import", daemon=True).start()
+
+# Threads shared by the whole process for reads started ahead of the part of the page that needs them
+# Anything cached with st.cache_resource that these threads can reach is created without a spinner,
+# as there is no page for a background thread to show one on
+@st.cache_resource(show_spinner=False)
+def get_fetch_pool():
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch")
+
+def _run_prefetch(fn, args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        # The caller that needs the data will try again itself
+        log_event("prefetch_failed", level=logging.WARNING, fetch=fn.__name__, error=str(e))
+
+# Start a slow read in the background so it overlaps with other reads and with drawing the page
+# The functions prefetched cache what they fetch and make any caller arriving part way through wait
+# for it, so the part of the page that needs the data just calls the same function as usual
+# The reads are counted and timed as part of the rerun that started them
+def prefetch(fn, *args):
+    return get_fetch_pool().submit(carry_rerun(_run_prefetch), fn, args)
+
+# Create a Google Sheets Connection
+@st.cache_resource(show_spinner=False)
+def get_gs_connection():
+    _, GSheetsConnection = _import_client_libraries()
+    return st.connection("gsheets", type=GSheetsConnection)
+
+# Function to initialise a Supabase DB connection from details stored in secrets
+@st.cache_resource(show_spinner=False)
+def init_supabase_connection():
+    create_client, _ = _import_client_libraries()
+    url = st.secrets["SUPABASE_URL"]
+    key = st.secrets["SUPABASE_KEY"]
+    return create_client(url, key)
+
+# Create the storage backend that every read and write of the project register and logs goes through
+# The Supabase client and the Google Sheets connection are set up at the same time
+# The logs are partitioned by cohort, with closed cohorts read from their archive (see log_archive.py)
+@st.cache_resource(show_spinner=False)
+def get_backend():
+    if TRACKER_BACKEND == "local":
+        log_event("backend_selected", backend="local", db=TRACKER_LOCAL_DB, register=TRACKER_LOCAL_REGISTER,
+                  delay=TRACKER_LOCAL_DELAY)
+        backend = InstrumentedBackend(LocalBackend(TRACKER_LOCAL_DB, TRACKER_LOCAL_REGISTER, delay=TRACKER_LOCAL_DELAY))
+    else:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            supabase = executor.submit(init_supabase_connection)
+            gs_conn = get_gs_connection()
+            backend = InstrumentedBackend(SupabaseBackend(supabase.result(), gs_conn))
+    return PartitionedBackend(backend, LogArchive(backend), get_cohort_partitions)
+
+# Placeholder shown at the top of the project dropdown before a project is chosen
+PROJECT_PLACEHOLDER = "Please Select a Project"
+
+# How long (in seconds) the project register is served before it is refreshed in the background
+PROJ_REGISTER_TTL = 60
+# Last known good copy of the project register, so a cold start or a Google Sheets outage
+# doesn't stop the page from loading - kept separate for the local backend so test data never
+# ends up being served as the real register
+PROJ_REGISTER_CACHE_PATH = os.environ.get(
+    "TRACKER_REGISTER_CACHE",
+    "local_project_register_cache.parquet" if TRACKER_BACKEND == "local" else "project_register.parquet"
+    )
+
+# Precompute the dropdown options, a lookup from dropdown label to project code and the index
+# behind the project search box alongside the register dataframe, so nothing needs rebuilding
+# or scanning on each rerun
+@timed()
+def build_proj_register(hsma_proj_reg_df):
+    hsma_proj_reg_df = hsma_proj_reg_df.sort_values("Project Code")
+    hsma_proj_reg_df["Full Project Title"] = hsma_proj_reg_df["Project Code"].astype('str') + ": " + hsma_proj_reg_df["Project Title"]
+    hsma_proj_reg_df["Full Project Title and Leads"] = hsma_proj_reg_df["Full Project Title"] + " (" + hsma_proj_reg_df["Lead"] + ")"
+    partitions = cohort_partitions(hsma_proj_reg_df)
+    return {
+        "df": hsma_proj_reg_df,
+        "project_list": [PROJECT_PLACEHOLDER] + hsma_proj_reg_df["Full Project Title and Leads"].tolist(),
+        "project_codes": dict(zip(hsma_proj_reg_df["Full Project Title and Leads"], hsma_proj_reg_df["Project Code"])),
+        "search_index": ProjectSearchIndex(hsma_proj_reg_df["Full Project Title and Leads"], hsma_proj_reg_df["Project Code"],
+                                           current_codes=[] if partitions is None else partitions["active_project_codes"]),
+        "partitions": partitions
+    }
+
+# Grab everything from the HSMA project register spreadsheet and save a copy to disk
+def fetch_proj_register(backend):
+    hsma_proj_reg_df = backend.read_register()
+    try:
+        hsma_proj_reg_df.to_parquet(PROJ_REGISTER_CACHE_PATH, index=False)
+    except Exception as e:
+        log_event("register_save_failed", level=logging.WARNING, error=str(e))
+    return build_proj_register(hsma_proj_reg_df)
+
+# Process-wide holder for the current copy of the project register
+@st.cache_resource(show_spinner=False)
+def get_proj_register_store():
+    return {"lock": threading.Lock(), "first_load_lock": threading.Lock(), "register": None, "fetched_at": None,
+            "refreshing": False}
+
+# The cohort partitions of the logs from the current copy of the project register, or None until
+# it has been loaded - reads of the logs don't wait for the register, and read the live table until then
+def get_cohort_partitions():
+    register = get_proj_register_store()["register"]
+    return None if register is None else register["partitions"]
+
+def refresh_proj_register(store, backend):
+    try:
+        register = fetch_proj_register(backend)
+        with store["lock"]:
+            store["register"] = register
+            store["fetched_at"] = monotonic()
+    except Exception as e:
+        log_event("register_refresh_failed", level=logging.WARNING, error=str(e))
+    finally:
+        with store["lock"]:
+            store["refreshing"] = False
+
+# Function to get the HSMA project register, returning the register dataframe, the dropdown
+# options and the label to project code lookup - callers must treat these as read-only
+# Uses stale-while-revalidate: once the copy is older than PROJ_REGISTER_TTL it is still
+# returned straight away, while a background thread fetches a fresh one
+# Only the very first load with no copy on disk has to wait for Google Sheets - any other
+# callers arriving while it is loading wait for it rather than fetching the register again
+@timed()
+def get_proj_register_df():
+    store = get_proj_register_store()
+
+    if store["register"] is None:
+        with store["first_load_lock"]:
+            with store["lock"]:
+                if store["register"] is None:
+                    try:
+                        store["register"] = build_proj_register(pd.read_parquet(PROJ_REGISTER_CACHE_PATH))
+                        log_event("register_loaded_from_disk", path=PROJ_REGISTER_CACHE_PATH)
+                    except Exception:
+                        pass
+
+            if store["register"] is None:
+                register = fetch_proj_register(get_backend())
+                with store["lock"]:
+                    store["register"] = register
+                    store["fetched_at"] = monotonic()
+                return register
+
+    with store["lock"]:
+        is_stale = store["fetched_at"] is None or monotonic() - store["fetched_at"] >= PROJ_REGISTER_TTL
+        if is_stale and not store["refreshing"]:
+            store["refreshing"] = True
+            threading.Thread(
+                target=refresh_proj_register, args=(store, get_backend()),
+                name="proj-register-refresh", daemon=True
+                ).start()
+        return store["register"]
+
+# Columns pulled back for cohort-wide views of the logs - the full log text is left behind
+LOG_HISTORY_COLUMNS = ["created_at", "project_code", "submitter", "entry_type"]
+# Number of rows requested per page - Supabase returns at most 1000 rows per request by default
+LOG_HISTORY_PAGE_SIZE = 1000
+# How long (in seconds) the log history is used before checking the database for new logs
+LOG_HISTORY_TTL = 300
+# How many ids below the highest already held are read again each refresh - a log's id is given out
+# when its write starts, so a log can turn up after logs with higher ids have been fetched
+LOG_HISTORY_OVERLAP_IDS = 200
+
+# Columns of the log history stored as a category rather than a string per row
+LOG_HISTORY_CATEGORIES = ["submitter", "entry_type"]
+
+# A page of log rows as a compactly typed dataframe - UTC timestamps, 32-bit project codes, submitters
+# and entry types as categories, and the number of the report each row belongs to (see
+# cohort_stats.ReportGrouper), from the grouper that has numbered every earlier page
+def _log_history_page(rows, report_grouper=None):
+    page_df = pd.DataFrame(rows, columns=LOG_HISTORY_COLUMNS)
+    page_df["created_at"] = pd.to_datetime(page_df["created_at"], utc=True, format="ISO8601")
+    page_df["project_code"] = page_df["project_code"].astype("int32")
+    page_df["report"] = pd.Series([
+        report_grouper.add(*row) for row in zip(page_df["project_code"], page_df["submitter"],
+                                                 page_df["created_at"], page_df["entry_type"])
+        ], dtype="int32")
+    page_df[LOG_HISTORY_CATEGORIES] = page_df[LOG_HISTORY_CATEGORIES].astype("category")
+    return page_df
+
+# Stack pages of the log history, keeping each category column as one shared set of categories
+def _concat_log_history(page_dfs):
+    log_history_df = pd.concat([page_df.drop(columns=LOG_HISTORY_CATEGORIES) for page_df in page_dfs],
+                               ignore_index=True)
+    for column in LOG_HISTORY_CATEGORIES:
+        log_history_df.insert(LOG_HISTORY_COLUMNS.index(column), column,
+                              pd.api.types.union_categoricals([page_df[column] for page_df in page_dfs]))
+    return log_history_df
+
+# Process-wide copy of the log history, shared by every session rather than copied into each one
+@st.cache_resource
+def get_log_history_store():
+    return {"lock": threading.Lock(), "df": _log_history_page([]), "last_id": None, "recent_ids": set(),
+            "fetched_at": None, "project_codes": None, "report_grouper": ReportGrouper()}
+
+# Function to grab the time, project, submitter and type of every log of the active cohort, numbered by report
+# The first call pages through the cohort's logs by id - after that, once the copy is older than
+# LOG_HISTORY_TTL, only logs from LOG_HISTORY_OVERLAP_IDS below the highest id already held are
+# fetched, and those not already held (their ids are kept in 'recent_ids') are added on
+# If the projects in the active cohort change, the logs are fetched again from the start
+# Every caller gets the same dataframe, so it must be treated as read-only
+@timed()
+def get_log_history_df():
+    store = get_log_history_store()
+    partitions = get_cohort_partitions()
+    project_codes = None if partitions is None else partitions["active_project_codes"]
+    with store["lock"]:
+        if store["project_codes"] != project_codes:
+            store.update({"df": _log_history_page([]), "last_id": None, "recent_ids": set(), "fetched_at": None,
+                          "project_codes": project_codes, "report_grouper": ReportGrouper()})
+        if store["fetched_at"] is not None and monotonic() - store["fetched_at"] < LOG_HISTORY_TTL:
+            return store["df"]
+
+        backend = get_backend()
+        page_dfs = [store["df"]]
+        last_id = store["last_id"]
+        recent_ids = set(store["recent_ids"])
+        after_id = None if last_id is None else last_id - LOG_HISTORY_OVERLAP_IDS
+        while True:
+            rows = backend.get_logs(["id"] + LOG_HISTORY_COLUMNS, after_id=after_id, limit=LOG_HISTORY_PAGE_SIZE)
+            new_rows = [row for row in rows if row["id"] not in recent_ids]
+            if new_rows:
+                page_dfs.append(_log_history_page(new_rows, store["report_grouper"]))
+            if rows:
+                after_id = rows[-1]["id"]
+                last_id = after_id if last_id is None else max(last_id, after_id)
+                recent_ids.update(row["id"] for row in rows)
+            if len(rows) < LOG_HISTORY_PAGE_SIZE:
+                break
+
+        # A new dataframe replaces the old one, so sessions part way through using it aren't affected
+        if len(page_dfs) > 1:
+            store["df"] = _concat_log_history(page_dfs)
+        store["last_id"] = last_id
+        if last_id is not None:
+            store["recent_ids"] = {log_id for log_id in recent_ids if log_id > last_id - LOG_HISTORY_OVERLAP_IDS}
+        store["fetched_at"] = monotonic()
+        return store["df"]
+
+# Process-wide renderer of portfolio documents, with its pool of render processes
+@st.cache_resource(show_spinner=False)
+def get_portfolio_renderer():
+    return PortfolioRenderer(get_backend())
+
+# How long (in seconds) the search index is used before checking the database for new logs
+SEARCH_INDEX_TTL = 60
+
+# Process-wide local full-text index of the project logs
+@st.cache_resource
+def get_search_index_store():
+    return {"lock": threading.Lock(), "index": SearchIndex(), "updated_at": None}
+
+# Function to get the search index, first fetching any logs added since it was last brought up to
+# date if that was more than SEARCH_INDEX_TTL ago - only the very first call has to index every log
+# The index covers every cohort, including archived ones, whichever cohorts are active
+# If the database can't be reached, the index is searched as it stands
+@timed()
+def get_search_index():
+    store = get_search_index_store()
+    with store["lock"]:
+        if store["updated_at"] is None or monotonic() - store["updated_at"] >= SEARCH_INDEX_TTL:
+            try:
+                store["index"].update(get_backend().all_cohorts())
+                store["updated_at"] = monotonic()
+            except Exception as e:
+                log_event("search_index_update_failed", level=logging.WARNING, error=str(e))
+    return store["index"]
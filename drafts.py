@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+
+from instrumentation import log_event
+
+# Default location of the on-disk store of unsent drafts
+DRAFTS_DB_PATH = os.environ.get("TRACKER_DRAFTS_DB", "drafts.db")
+
+# A draft is written to disk once it has gone this many seconds without changing, or once it has
+# been waiting this long in total while still changing - so typing never causes a write per rerun
+SAVE_AFTER_QUIET = 3
+SAVE_AFTER_MAX = 15
+
+# Drafts not touched for this many days are deleted
+DRAFT_MAX_AGE_DAYS = 30
+
+# How many drafts' last written fields are remembered - saving one that has been forgotten writes it again
+WRITTEN_DRAFTS_KEPT = 1000
+
+
+# Unsent drafts of log updates, keyed by submitter and project, so a long update survives a
+# dropped connection or an app restart
+#
+# save() only updates an in-memory copy - a background thread writes drafts to a local SQLite
+# database once they stop changing, so repeated saves of the same draft are coalesced into one write
+class DraftStore:
+
+    def __init__(self, db_path=DRAFTS_DB_PATH, save_after_quiet=SAVE_AFTER_QUIET, save_after_max=SAVE_AFTER_MAX):
+        self.save_after_quiet = save_after_quiet
+        self.save_after_max = save_after_max
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        # Drafts waiting to be written: key -> {"fields", "saved_at", "first_change", "last_change"}
+        # fields of None means the draft is to be deleted
+        self._pending = {}
+        # Fields of the most recently written drafts, so saving a draft that hasn't changed is a no-op
+        self._written = OrderedDict()
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS drafts (
+                    submitter TEXT NOT NULL,
+                    project_code INTEGER NOT NULL,
+                    fields TEXT NOT NULL,
+                    saved_at TEXT NOT NULL,
+                    PRIMARY KEY (submitter, project_code)
+                )
+                """)
+            self._conn.execute(
+                "DELETE FROM drafts WHERE saved_at < ?",
+                ((datetime.now(timezone.utc) - timedelta(days=DRAFT_MAX_AGE_DAYS)).isoformat(),)
+                )
+
+        self._worker = threading.Thread(target=self._run, name="draft-store", daemon=True)
+        self._worker.start()
+
+    @staticmethod
+    def _key(submitter, project_code):
+        return (submitter.strip(), int(project_code))
+
+    def _set(self, key, fields):
+        now = monotonic()
+        with self._lock:
+            pending = self._pending.get(key)
+            self._pending[key] = {
+                "fields": fields,
+                "saved_at": datetime.now(timezone.utc).isoformat(),
+                "first_change": pending["first_change"] if pending is not None else now,
+                "last_change": now,
+            }
+        self._wake.set()
+
+    # Record the current contents of a draft (a dict of field name to text)
+    # A draft with nothing written in it is ignored rather than replacing the saved one, as that is
+    # what a fresh session looks like before a draft has been restored - use discard() to delete one
+    def save(self, submitter, project_code, fields):
+        key = self._key(submitter, project_code)
+        if not any(fields.values()):
+            return
+        with self._lock:
+            pending = self._pending.get(key)
+            current = pending["fields"] if pending is not None else self._written.get(key)
+            if current == fields:
+                return
+        self._set(key, fields)
+
+    # Delete a draft, e.g. once it has been submitted
+    def discard(self, submitter, project_code):
+        self._set(self._key(submitter, project_code), None)
+
+    # The latest draft for a submitter and project as a dict of "fields" and "saved_at", or None
+    def load(self, submitter, project_code):
+        key = self._key(submitter, project_code)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                if pending["fields"] is None:
+                    return None
+                return {"fields": pending["fields"], "saved_at": pending["saved_at"]}
+            row = self._conn.execute(
+                "SELECT fields, saved_at FROM drafts WHERE submitter = ? AND project_code = ?", key
+                ).fetchone()
+        if row is None:
+            return None
+        return {"fields": json.loads(row[0]), "saved_at": row[1]}
+
+    def _write(self):
+        now = monotonic()
+        with self._lock:
+            due = {
+                key: pending for key, pending in self._pending.items()
+                if now - pending["last_change"] >= self.save_after_quiet
+                or now - pending["first_change"] >= self.save_after_max
+            }
+            if len(due) == 0:
+                return
+            try:
+                with self._conn:
+                    for key, pending in due.items():
+                        if pending["fields"] is None:
+                            self._conn.execute("DELETE FROM drafts WHERE submitter = ? AND project_code = ?", key)
+                        else:
+                            self._conn.execute(
+                                """INSERT INTO drafts (submitter, project_code, fields, saved_at) VALUES (?, ?, ?, ?)
+                                   ON CONFLICT (submitter, project_code)
+                                   DO UPDATE SET fields = excluded.fields, saved_at = excluded.saved_at""",
+                                (*key, json.dumps(pending["fields"]), pending["saved_at"])
+                                )
+            except sqlite3.Error as e:
+                # Leave the drafts pending, to be tried again next time round
+                log_event("draft_save_failed", level=logging.WARNING, drafts=len(due), error=str(e))
+                return
+            for key, pending in due.items():
+                if pending["fields"] is None:
+                    self._written.pop(key, None)
+                else:
+                    self._written[key] = pending["fields"]
+                    self._written.move_to_end(key)
+                del self._pending[key]
+            while len(self._written) > WRITTEN_DRAFTS_KEPT:
+                self._written.popitem(last=False)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                next_due = min(
+                    (min(pending["last_change"] + self.save_after_quiet, pending["first_change"] + self.save_after_max)
+                     for pending in self._pending.values()),
+                    default=None
+                    )
+            if next_due is None:
+                self._wake.wait()
+            else:
+                self._wake.wait(timeout=max(0, next_due - monotonic()))
+            self._wake.clear()
+            self._write()
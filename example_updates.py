@@ -0,0 +1,56 @@
+# Example entries shown next to the log forms
+# Kept as module-level constants so they are built once per process rather than on every rerun
+
+# Examples shown beside the quick update form
+SIMPLE_EXAMPLES = [
+    """This month we have been focussing on developing our understanding of the ED and engaging with key stakeholders.
+
+We have started to arrange an expert panel of ED staff to gather insights on workflow, patient flow patterns, and resource allocation challenges.
+
+We have also started pulling out historical arrival patterns and conducting some exploratory data analysis to see how different patient groups differ and if there are data quality issues.
+
+In the next month, we will be focussing on first version of a conceptual model of the ED for review by the expert panel.
+We'll also finish conducting our EDA and produce a first suggested list of patient groups that may require different activity time or arrival time distributions.""",
+
+    """Due to sickness in the project team this month, we have been unable to progress the project as planned.
+
+We have rescheduled the planned meeting to show our model to the stakeholders to next month.
+
+Currently we are having trouble gaining agreement to publish our code on GitHub.""",
+
+    """Most of my project time this month has been spent exploring the literature and other sources like Github to see if anyone else has done work in this area.
+I haven't found any code I can adapt, but I did find an interesting paper on non-attendance prediction by Mark et al (2019) where they achieved an AUC of 0.79.
+
+I'm currently blocked by waiting for data access so will continue to explore the literature and write some template code.""",
+]
+
+# Example for each box of the structured form
+STRUCTURED_EXAMPLES = {
+    "progress": """- Main area of focus was continuing with exploratory data analysis and data quality assessment of available data.
+- Continued to develop understanding of urgent care system.
+- Visually explored care pathways and diagnostic history of frequent users of and packaged into reusable interactive HTML format that could be distributed (however, further polish would be required, plus IG considerations). This is effectively an R/Plotly implementation of the Theograph concept that could be further developed.
+- Additional reading of emergency department modelling literature; storing this in Zotero for reference during writeup.""",
+
+    "meetings": """- Afternoon in-person with head of operations to discuss work so far and explore additional areas of interest
+- Chat with Bob Bobson (HSMA 5 alumni) about experience working on a similar project last year - identified areas of potential code reuse""",
+
+    "challenges": """- Continued difficulty with access to relevant ICB dashboards due to licencing.
+- Large volume of ad-hoc requests have limited additional time available for project work
+- Short month due to bank holidays and one member of team on annual leave for 2 weeks
+- We're getting good engagement in general, but there's been some misunderstandings about the simplifications in the model that needs to be addressed""",
+
+    "plans": """Activities:
+- Get all steps required to fully automate data flows complete.
+- Add in additional sliders to model to allow for manual tweaking of demand forecasts.
+
+Key meetings
+- Meeting with operational lead on 6th April to discuss training and implementation plans, plus post-implementation review and next steps
+- Presenting work in emergency care board meeting on 7th April""",
+
+    "other": """A request for a dashboard to support bed delivery meetings came in – a colleague was able to adapt my work to quickly provide all of the data required for these meetings.
+Feedback from this group has been positive.
+
+Two follow-up meetings regarding wider implementation and potential for dissemination of learning came out of the presentation to our expert panel, and the following feedback was received
+from an ICB colleague present at this presentation: "The project team have just blown everyone’s minds with how they have engaged with operational end-users in a complex area and developed a model that are what everyone didn’t know they needed and didn’t think was possible.
+Really helped showcase the potential of data and the need to invest in the capacity and capability of data science.”""",
+}
@@ -0,0 +1,263 @@
+import json
+import logging
+import sys
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from time import perf_counter, thread_time
+
+# How many recent reruns, and how many recent timings of each span, are kept for the diagnostics panel
+RECENT_RERUNS = 500
+RECENT_SPANS = 1000
+
+PERCENTILES = [50, 90, 95, 99]
+
+# Structured logging - every event is written as a single line of JSON
+logger = logging.getLogger("hsma_tracker")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+def log_event(event, level=logging.INFO, **fields):
+    logger.log(level, json.dumps(
+        {"time": datetime.now(timezone.utc).isoformat(), "event": event, **fields},
+        default=str
+        ))
+
+
+# Process-wide record of recent reruns, recent timings of each span and running totals of each counter
+_lock = threading.Lock()
+_recent_reruns = deque(maxlen=RECENT_RERUNS)
+_recent_spans = {}
+_counter_totals = {}
+# Recent timings of the timer-driven reruns of polling fragments that found nothing to do, kept
+# apart so the idle ticks don't push every other rerun and span out of the recent timings
+_recent_idle_ticks = {}
+
+# The rerun currently being recorded on this thread
+# Streamlit runs button callbacks just before the script, in the same thread, so a record
+# is started by whichever comes first and carries on until finish_rerun() is called
+# Work handed to another thread with carry_rerun() is recorded against the same rerun, so the
+# record's contents are only changed while holding _lock
+_local = threading.local()
+
+def _current_rerun():
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        rerun = {"kind": "callback", "name": None, "started": perf_counter(), "started_cpu": thread_time(),
+                 "spans": {}, "counters": {}, "marks": {}}
+        _local.rerun = rerun
+    return rerun
+
+def _finish(rerun):
+    _local.rerun = None
+    finished = perf_counter()
+    finished_cpu = thread_time()
+    with _lock:
+        record = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "kind": rerun["kind"],
+            "name": rerun["name"],
+            "total_ms": round((finished - rerun["started"]) * 1000, 2),
+            "cpu_ms": round((finished_cpu - rerun["started_cpu"]) * 1000, 2),
+            "spans_ms": {name: round(wall * 1000, 2) for name, (wall, cpu) in rerun["spans"].items()},
+            "spans_cpu_ms": {name: round(cpu * 1000, 2) for name, (wall, cpu) in rerun["spans"].items()},
+            "counters": dict(rerun["counters"]),
+            "marks_ms": dict(rerun["marks"]),
+        }
+        _recent_reruns.append(record)
+    return record
+
+# Call at the very top of a page script
+def start_rerun(name):
+    # A script record still open here belongs to a run that was interrupted (e.g. by st.rerun)
+    if getattr(_local, "rerun", None) is not None and _local.rerun["kind"] == "script":
+        _local.rerun = None
+    rerun = _current_rerun()
+    rerun["kind"] = "script"
+    rerun["name"] = name
+
+# Call at the very bottom of a page script - returns the finished record of the rerun
+def finish_rerun():
+    return _finish(_current_rerun())
+
+# Record how far into the current rerun (in milliseconds) a point in the script was reached,
+# e.g. when the page header has been drawn
+def mark(name):
+    rerun = _current_rerun()
+    with _lock:
+        rerun["marks"][name] = round((perf_counter() - rerun["started"]) * 1000, 2)
+
+# Add to a counter (e.g. database reads) for the current rerun and the process as a whole
+def count(name, amount=1):
+    counters = _current_rerun()["counters"]
+    with _lock:
+        counters[name] = counters.get(name, 0) + amount
+        _counter_totals[name] = _counter_totals.get(name, 0) + amount
+
+# Time a block of code (both wall-clock and CPU time of the thread running it), adding it
+# to the current rerun and to the span's recent timings
+@contextmanager
+def span(name):
+    start = perf_counter()
+    start_cpu = thread_time()
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - start
+        cpu_seconds = thread_time() - start_cpu
+        rerun = _current_rerun()
+        with _lock:
+            wall_total, cpu_total = rerun["spans"].get(name, (0, 0))
+            rerun["spans"][name] = (wall_total + seconds, cpu_total + cpu_seconds)
+            # A polling tick's timings are held back until it is known whether it did anything
+            if "tick_spans" in rerun:
+                rerun["tick_spans"].append((name, seconds))
+            else:
+                _recent_spans.setdefault(name, deque(maxlen=RECENT_SPANS)).append(seconds)
+
+# Decorator version of span(), named after the function unless a name is given
+def timed(name=None):
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Wrap a function to be run on another thread (e.g. in a thread pool) so its spans and counters are
+# added to the rerun that is being recorded on the thread calling carry_rerun(), rather than to a
+# record of the other thread's own that is never finished
+# Anything still running once that rerun has finished is left out of its record
+def carry_rerun(func):
+    rerun = _current_rerun()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "rerun", None)
+        _local.rerun = rerun
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.rerun = previous
+    return wrapper
+
+# Wrap the body of an @st.fragment function
+# When the fragment runs as part of the whole script (or of another fragment it is nested in) this
+# is just a span, but when the fragment reruns on its own it is recorded as a rerun in its own right
+# A polling fragment (one with run_every) reruns on its own on a timer, and most of those ticks
+# find nothing to do - a tick that makes no counted calls is only timed in a bucket of its own
+@contextmanager
+def fragment_run(name, polling=False):
+    rerun = _current_rerun()
+    if rerun["kind"] in ("script", "fragment"):
+        with span(name):
+            yield
+    else:
+        rerun["kind"] = "fragment"
+        rerun["name"] = name
+        if polling:
+            rerun["tick_spans"] = []
+        try:
+            with span(name):
+                yield
+        finally:
+            if polling and not rerun["counters"]:
+                _local.rerun = None
+                with _lock:
+                    _recent_idle_ticks.setdefault(name, deque(maxlen=RECENT_SPANS)).append(
+                        perf_counter() - rerun["started"])
+            else:
+                with _lock:
+                    for span_name, seconds in rerun.pop("tick_spans", []):
+                        _recent_spans.setdefault(span_name, deque(maxlen=RECENT_SPANS)).append(seconds)
+                _finish(rerun)
+
+# Decorator version of fragment_run(), to go underneath @st.fragment
+def timed_fragment(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with fragment_run(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+# Version of timed_fragment for fragments with run_every
+def timed_polling_fragment(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with fragment_run(func.__name__, polling=True):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _percentiles(values_ms):
+    # numpy is only needed for the diagnostics panel, so it isn't imported on a cold start
+    import numpy as np
+
+    if len(values_ms) == 0:
+        return {}
+    values_ms = np.asarray(values_ms)
+    summary = {f"p{p}": round(float(np.percentile(values_ms, p)), 2) for p in PERCENTILES}
+    summary["max"] = round(float(values_ms.max()), 2)
+    summary["count"] = len(values_ms)
+    return summary
+
+# Most recent reruns first
+def get_recent_reruns():
+    with _lock:
+        return list(reversed(_recent_reruns))
+
+# Percentiles (in milliseconds) of the recent timings of each span, of whole reruns of each kind
+# and of the idle ticks of each polling fragment
+def get_percentiles():
+    with _lock:
+        span_timings = {name: [seconds * 1000 for seconds in timings] for name, timings in _recent_spans.items()}
+        idle_tick_timings = {f"idle tick: {name}": [seconds * 1000 for seconds in timings]
+                             for name, timings in _recent_idle_ticks.items()}
+        rerun_timings = {}
+        for rerun in _recent_reruns:
+            rerun_timings.setdefault(f"rerun: {rerun['kind']} {rerun['name']}", []).append(rerun["total_ms"])
+    return {name: _percentiles(timings)
+            for name, timings in {**rerun_timings, **idle_tick_timings, **span_timings}.items()}
+
+def get_counter_totals():
+    with _lock:
+        return dict(_counter_totals)
+
+
+# Wraps a storage backend so every call is timed and counted as a database or Google Sheets call
+class InstrumentedBackend:
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def read_register(self):
+        count("sheets_reads")
+        with span("backend.read_register"):
+            return self.backend.read_register()
+
+    def insert_logs(self, rows):
+        count("db_writes")
+        with span("backend.insert_logs"):
+            return self.backend.insert_logs(rows)
+
+    def get_latest_update(self, project_code):
+        count("db_reads")
+        with span("backend.get_latest_update"):
+            return self.backend.get_latest_update(project_code)
+
+    def get_logs(self, *args, **kwargs):
+        count("db_reads")
+        with span("backend.get_logs"):
+            return self.backend.get_logs(*args, **kwargs)
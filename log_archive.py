@@ -0,0 +1,359 @@
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from time import monotonic
+
+import pandas as pd
+
+from backends import LOG_COLUMNS, TRACKER_BACKEND
+from instrumentation import count, log_event, span
+
+# Column of the project register giving the cohort each project belongs to
+COHORT_COLUMN = "Cohort"
+
+# Cohorts whose logs are read by default, as a comma-separated list - if not set, the cohort of the
+# most recently registered project (the one with the highest project code) is the active cohort
+TRACKER_ACTIVE_COHORTS = os.environ.get("TRACKER_ACTIVE_COHORTS", "")
+
+# Folder archive files are downloaded to from the backend's archive store, where the archives are kept
+# It is only a local copy, so it can be deleted at any time
+# Kept separate for the local backend so test data never ends up being served as real logs
+LOG_ARCHIVE_DIR = os.environ.get(
+    "TRACKER_LOG_ARCHIVE",
+    "local_log_archive" if TRACKER_BACKEND == "local" else "log_archive"
+    )
+
+# Number of log rows requested from the backend at a time when archiving a cohort
+ARCHIVE_PAGE_SIZE = 1000
+# Rows per row group of an archive file - the file is sorted by project, so reading one
+# project's logs only has to decompress the row groups holding that project
+ARCHIVE_ROW_GROUP_SIZE = 2000
+# How long (in seconds) the list of archives in the archive store is used before it is listed again
+# The logs of a newly archived cohort aren't deleted from the live table until this long after it is
+# archived, so every running app has found the archive by then
+ARCHIVE_LIST_TTL = 60
+
+
+# Cohorts come from a spreadsheet, so may be read in as numbers, floats or text
+def _cohort_name(value):
+    if pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() or None
+
+
+# The cohort partitions of the project logs, from the project register
+# Returns None if the register has no cohort column, in which case the logs aren't partitioned
+# Projects without a cohort are treated as part of the active cohort, as they are most likely new
+def cohort_partitions(hsma_proj_reg_df):
+    if COHORT_COLUMN not in hsma_proj_reg_df.columns:
+        return None
+
+    # A blank or non-numeric project code can't have any logs, so that row isn't in any partition
+    project_codes = pd.to_numeric(hsma_proj_reg_df["Project Code"], errors="coerce")
+    project_cohorts = {
+        int(project_code): _cohort_name(cohort)
+        for project_code, cohort in zip(project_codes, hsma_proj_reg_df[COHORT_COLUMN])
+        if pd.notna(project_code)
+    }
+    if TRACKER_ACTIVE_COHORTS.strip():
+        active_cohorts = {cohort.strip() for cohort in TRACKER_ACTIVE_COHORTS.split(",") if cohort.strip()}
+    else:
+        with_cohort = [project_code for project_code, cohort in project_cohorts.items() if cohort is not None]
+        active_cohorts = {project_cohorts[max(with_cohort)]} if with_cohort else set()
+
+    cohort_projects = {}
+    for project_code, cohort in project_cohorts.items():
+        cohort_projects.setdefault(cohort, []).append(project_code)
+    return {
+        "project_cohorts": project_cohorts,
+        "cohort_projects": cohort_projects,
+        "active_cohorts": active_cohorts,
+        "active_project_codes": sorted(
+            project_code for cohort in active_cohorts | {None} for project_code in cohort_projects.get(cohort, [])
+            ),
+    }
+
+
+# Logs of closed cohorts, archived to a zstd-compressed Parquet file per cohort
+# Only the columns of a log are kept (not the idempotency key), and each file is sorted by
+# project and then id, so reading one project's logs skips the rest of the file
+#
+# The files are kept in the backend's archive store (Supabase Storage for the live backend), so they
+# outlast the server's disk - each is downloaded to archive_dir the first time it is read
+class LogArchive:
+
+    def __init__(self, backend, archive_dir=LOG_ARCHIVE_DIR):
+        self.backend = backend
+        self.archive_dir = Path(archive_dir)
+        self._lock = threading.Lock()
+        self._archives = {}
+        self._listed_at = None
+
+    def file_name(self, cohort):
+        return f"cohort_{re.sub(r'[^0-9A-Za-z_-]', '_', str(cohort))}.parquet"
+
+    # Dict of each file in the archive store to its version, listed again once it is ARCHIVE_LIST_TTL old
+    # If the store can't be reached, the last list is used until the next time it is due to be listed
+    def _list_archives(self, refresh=False):
+        with self._lock:
+            if refresh or self._listed_at is None or monotonic() - self._listed_at >= ARCHIVE_LIST_TTL:
+                try:
+                    self._archives = self.backend.list_archives()
+                except Exception as e:
+                    if refresh:
+                        raise
+                    log_event("archive_list_failed", level=logging.WARNING, error=str(e))
+                self._listed_at = monotonic()
+            return self._archives
+
+    def has_cohort(self, cohort):
+        return cohort is not None and self.file_name(cohort) in self._list_archives()
+
+    # Local copy of the latest version of a cohort's archive file, downloaded if it isn't here yet
+    # Each version is downloaded under a name of its own, so a file part way through being read is
+    # never replaced
+    def _local_path(self, cohort):
+        name = self.file_name(cohort)
+        version = re.sub(r"[^0-9A-Za-z]", "", self._list_archives()[name])
+        path = self.archive_dir / f"{Path(name).stem}_{version}.parquet"
+        with self._lock:
+            if not path.exists():
+                self.archive_dir.mkdir(parents=True, exist_ok=True)
+                downloading_path = path.with_name(path.name + ".downloading")
+                with span("archive.download"):
+                    self.backend.download_archive(name, downloading_path)
+                os.replace(downloading_path, path)
+        return path
+
+    # Write every log row of a cohort to its archive file in the archive store, replacing any earlier
+    # archive of it - the store replaces the file in one go, so a half-written archive is never read
+    def write_cohort(self, cohort, log_rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([("id", pa.int64()), ("created_at", pa.string()), ("project_code", pa.int32()),
+                            ("submitter", pa.string()), ("entry_type", pa.string()), ("entry", pa.string())])
+        table = pa.Table.from_pylist([{column: row[column] for column in LOG_COLUMNS} for row in log_rows], schema=schema)
+        table = table.sort_by([("project_code", "ascending"), ("id", "ascending")])
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        writing_path = self.archive_dir / (self.file_name(cohort) + ".writing")
+        try:
+            pq.write_table(table, writing_path, compression="zstd", row_group_size=ARCHIVE_ROW_GROUP_SIZE)
+            self.backend.upload_archive(self.file_name(cohort), writing_path)
+        finally:
+            writing_path.unlink(missing_ok=True)
+        self._list_archives(refresh=True)
+
+    # Same as a backend's get_logs, for one archived cohort
+    def get_logs(self, cohort, columns, after_id=None, limit=1000, project_code=None):
+        import pyarrow.parquet as pq
+
+        for column in columns:
+            if column not in LOG_COLUMNS:
+                raise ValueError(f"Unknown ProjectLogs column: {column}")
+        filters = []
+        if after_id is not None:
+            filters.append(("id", ">", int(after_id)))
+        if project_code is not None:
+            filters.append(("project_code", "=", int(project_code)))
+        table = pq.read_table(self._local_path(cohort), columns=list(dict.fromkeys(columns + ["id"])),
+                              filters=filters or None)
+        return table.sort_by("id").slice(0, limit).select(columns).to_pylist()
+
+    # Every log row of an archived cohort
+    def read_cohort(self, cohort):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(self._local_path(cohort), columns=LOG_COLUMNS).to_pylist()
+
+    # Highest id in an archived cohort, from the file's statistics rather than its rows
+    def max_id(self, cohort):
+        import pyarrow.parquet as pq
+
+        metadata = pq.ParquetFile(self._local_path(cohort)).metadata
+        id_column = metadata.schema.names.index("id")
+        return max((metadata.row_group(row_group).column(id_column).statistics.max
+                    for row_group in range(metadata.num_row_groups)), default=None)
+
+    # Same as a backend's get_latest_update, for a project in an archived cohort
+    def get_latest_update(self, cohort, project_code):
+        import pyarrow.parquet as pq
+
+        logs_df = pq.read_table(self._local_path(cohort), columns=["created_at", "submitter"],
+                                filters=[("project_code", "=", int(project_code))]).to_pandas()
+        if len(logs_df) == 0:
+            return None
+        latest = logs_df.loc[pd.to_datetime(logs_df["created_at"], utc=True, format="ISO8601").idxmax()]
+        return {"created_at": latest["created_at"], "submitter": latest["submitter"]}
+
+
+# Latest of two latest updates, either of which may be None
+def _later(update, other_update):
+    if update is None or other_update is None:
+        return update or other_update
+    return max(update, other_update, key=lambda latest: pd.Timestamp(latest["created_at"]))
+
+# Merge pages of log rows, keeping the first 'limit' in id order
+# A log is in both its archive and the live table if the cohort was archived without deleting its
+# logs, so each id is only kept once
+def _merge_pages(pages, columns, limit):
+    rows = {row["id"]: row for page in pages for row in page}
+    return [{column: rows[log_id][column] for column in columns} for log_id in sorted(rows)[:limit]]
+
+
+# A backend with the project logs partitioned by cohort - provides the same methods as the backend
+# it wraps (see backends.py), reading each project's logs from wherever its cohort is kept
+#
+# get_logs() without a project code reads only the active cohorts' logs, unless given a cohort -
+# so paging through the logs costs the same however many cohorts have come before
+# A project in an archived cohort is read from the archive, along with any logs submitted for it
+# since the cohort was archived, which are still in the live table until it is archived again
+# get_partitions is called for the current partitions (see cohort_partitions()) - while it returns
+# None, every read goes to the live table as it is
+# With every_cohort, get_logs() without a project code or cohort reads every log instead - see all_cohorts()
+class PartitionedBackend:
+
+    def __init__(self, backend, archive, get_partitions, every_cohort=False):
+        self.backend = backend
+        self.archive = archive
+        self.get_partitions = get_partitions
+        self.every_cohort = every_cohort
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    # The same backend, reading every cohort's logs (archived or not) when not given projects or a
+    # cohort - for keeping a copy of every log, like the search index
+    def all_cohorts(self):
+        return PartitionedBackend(self.backend, self.archive, self.get_partitions, every_cohort=True)
+
+    def _cohort_of(self, project_code, partitions):
+        if partitions is None:
+            return None
+        return partitions["project_cohorts"].get(int(project_code))
+
+    def get_latest_update(self, project_code):
+        cohort = self._cohort_of(project_code, self.get_partitions())
+        latest_update = self.backend.get_latest_update(project_code)
+        if not self.archive.has_cohort(cohort):
+            return latest_update
+        count("archive_reads")
+        with span("archive.get_latest_update"):
+            return _later(self.archive.get_latest_update(cohort, project_code), latest_update)
+
+    # cohort picks a cohort to read every project's logs from, instead of the active cohorts
+    def get_logs(self, columns, after_id=None, limit=1000, project_code=None, project_codes=None, cohort=None):
+        partitions = self.get_partitions()
+        if self.every_cohort and project_code is None and project_codes is None and cohort is None:
+            return self._get_every_cohorts_logs(columns, after_id, limit, partitions)
+
+        if project_code is not None:
+            cohort = self._cohort_of(project_code, partitions)
+        elif project_codes is None and partitions is not None:
+            if cohort is None:
+                project_codes = partitions["active_project_codes"]
+            else:
+                project_codes = partitions["cohort_projects"].get(str(cohort), [])
+        elif cohort is not None:
+            raise ValueError("The cohort to read can't be given without the project register's cohorts")
+
+        if not self.archive.has_cohort(cohort):
+            return self.backend.get_logs(columns, after_id=after_id, limit=limit, project_code=project_code,
+                                         project_codes=project_codes)
+
+        # The pages are merged by id, so both have to include it
+        merge_columns = list(dict.fromkeys(columns + ["id"]))
+        live_rows = self.backend.get_logs(merge_columns, after_id=after_id, limit=limit, project_code=project_code,
+                                          project_codes=project_codes)
+        count("archive_reads")
+        with span("archive.get_logs"):
+            archived_rows = self.archive.get_logs(cohort, merge_columns, after_id=after_id, limit=limit,
+                                                  project_code=project_code)
+        return _merge_pages([archived_rows, live_rows], columns, limit)
+
+    # A page of every log in the live table and in every cohort's archive
+    # Archives holding nothing after after_id (which is all of them, once a copy has caught up) aren't read
+    def _get_every_cohorts_logs(self, columns, after_id, limit, partitions):
+        merge_columns = list(dict.fromkeys(columns + ["id"]))
+        pages = [self.backend.get_logs(merge_columns, after_id=after_id, limit=limit)]
+        archived_cohorts = [] if partitions is None else [
+            cohort for cohort in partitions["cohort_projects"] if self.archive.has_cohort(cohort)
+            ]
+        for cohort in archived_cohorts:
+            max_id = self.archive.max_id(cohort)
+            if max_id is not None and (after_id is None or max_id > after_id):
+                count("archive_reads")
+                with span("archive.get_logs"):
+                    pages.append(self.archive.get_logs(cohort, merge_columns, after_id=after_id, limit=limit))
+        return _merge_pages(pages, columns, limit)
+
+
+# Archive the logs of a closed cohort
+# Run from the repository root with:
+#     python log_archive.py --cohort 6 [--delete]
+# which writes every log of the cohort's projects (including any already archived) to its archive
+# file in the archive store, checks the stored file, and with --delete then removes exactly the logs
+# archived from the live table
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive the logs of a closed cohort to a Parquet file")
+    parser.add_argument("--cohort", required=True)
+    parser.add_argument("--delete", action="store_true", help="remove the archived logs from the live table")
+    args = parser.parse_args()
+
+    if TRACKER_BACKEND == "local":
+        from backends import LocalBackend, TRACKER_LOCAL_DB, TRACKER_LOCAL_REGISTER
+        backend = LocalBackend(TRACKER_LOCAL_DB, TRACKER_LOCAL_REGISTER)
+    else:
+        from data_access import get_backend
+        # The live tables, without the archive in front of them
+        backend = get_backend().backend
+
+    partitions = cohort_partitions(backend.read_register())
+    if partitions is None:
+        raise SystemExit(f"The project register has no '{COHORT_COLUMN}' column")
+    cohort = str(args.cohort)
+    project_codes = partitions["cohort_projects"].get(cohort)
+    if not project_codes:
+        raise SystemExit(f"No projects in the register belong to cohort {cohort}")
+    if cohort in partitions["active_cohorts"]:
+        raise SystemExit(f"Cohort {cohort} is still active, so its logs are left in the live table")
+
+    # Logs submitted for the cohort's projects since it was last archived are added to the archive
+    archive = LogArchive(backend)
+    already_archived = archive.has_cohort(cohort)
+    log_rows = {row["id"]: row for row in (archive.read_cohort(cohort) if already_archived else [])}
+    live_rows = []
+    after_id = None
+    while True:
+        page = backend.get_logs(LOG_COLUMNS, after_id=after_id, limit=ARCHIVE_PAGE_SIZE, project_codes=project_codes)
+        live_rows += page
+        if len(page) < ARCHIVE_PAGE_SIZE:
+            break
+        after_id = page[-1]["id"]
+    log_rows.update((row["id"], row) for row in live_rows)
+
+    archive.write_cohort(cohort, list(log_rows.values()))
+    # Checked against a fresh download of the stored file, so nothing is deleted unless the store has it
+    archived_ids = {row["id"] for row in archive.read_cohort(cohort)}
+    if archived_ids != log_rows.keys():
+        raise SystemExit(f"The stored {archive.file_name(cohort)} doesn't hold the {len(log_rows)} logs it should"
+                         " - nothing was deleted")
+    print(f"Archived {len(log_rows)} logs of cohort {cohort} ({len(live_rows)} from the live table) "
+          f"to {archive.file_name(cohort)} in the archive store")
+
+    if args.delete and live_rows:
+        # Until a running app lists the archive store again, it reads the cohort's projects from the live table
+        if not already_archived:
+            print(f"Waiting {ARCHIVE_LIST_TTL} seconds for running apps to find the new archive...")
+            time.sleep(ARCHIVE_LIST_TTL)
+        # Only the logs read above are deleted, by id - a log with a lower id than these that was still
+        # being written when they were read is left in the live table, to be archived next time
+        backend.delete_logs([row["id"] for row in live_rows])
+        print(f"Deleted {len(live_rows)} archived logs from the live table")
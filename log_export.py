@@ -0,0 +1,142 @@
+import csv
+import io
+import os
+
+import pandas as pd
+
+from backends import LOG_COLUMNS
+from cohort_stats import ENTRY_TYPES, ReportGrouper
+
+# Formats a log history can be exported in, and the file extension for each
+EXPORT_FORMATS = {"Markdown": ".md", "CSV": ".csv", "Parquet": ".parquet"}
+
+# Number of log rows requested from the backend at a time
+EXPORT_PAGE_SIZE = 1000
+# Number of reports written to each row group of a Parquet export
+PARQUET_ROW_GROUP_REPORTS = 1000
+# Largest export (in MB) offered for download - Streamlit holds a download in memory until the session
+# next reruns, so this bounds what one session's export can add to the server's memory
+MAX_EXPORT_DOWNLOAD_MB = float(os.environ.get("TRACKER_MAX_EXPORT_MB", "50"))
+
+# Heading each type of entry is given in a Markdown export - matches the 'copy update as markdown' text
+ENTRY_HEADINGS = {
+    "Simple Log": "Project Progress",
+    "Structured Log - Progress": "Project Progress",
+    "Structured Log - Meetings": "Project-related Meetings",
+    "Structured Log - Challenges": "Challenges",
+    "Structured Log - Planned Activities": "Next Steps",
+    "Structured Log - Other Comments": "Other Comments",
+}
+
+# Columns of a CSV or Parquet export - one row per report, with a column for each type of entry
+REPORT_COLUMNS = ["created_at", "project_code", "project", "submitter"] + ENTRY_TYPES
+
+
+# Every log row for a project (or for every project if project_code is None) in id order,
+# paging through the table by id so only one page is held in memory at a time
+def iter_log_rows(backend, project_code=None, page_size=EXPORT_PAGE_SIZE):
+    after_id = None
+    while True:
+        rows = backend.get_logs(LOG_COLUMNS, after_id=after_id, limit=page_size, project_code=project_code)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]["id"]
+
+# Group log rows back into the reports they were submitted as (see cohort_stats.ReportGrouper),
+# yielding each report once no later row can belong to it - only the few reports still open are held
+def iter_reports(log_rows):
+    grouper = ReportGrouper()
+    reports = {}
+    for row in log_rows:
+        report_number = grouper.add(row["project_code"], row["submitter"], row["created_at"], row["entry_type"])
+        report = reports.setdefault(report_number, {"created_at": row["created_at"], "project_code": row["project_code"],
+                                                    "submitter": row["submitter"], "entries": {}})
+        report["entries"][row["entry_type"]] = row["entry"]
+        for closed_number in grouper.take_closed():
+            yield reports.pop(closed_number)
+    for closed_number in grouper.take_closed(final=True):
+        yield reports.pop(closed_number)
+
+
+def _report_markdown(report, project_title):
+    report_md = f"""## Project: {project_title}
+
+Date: {pd.Timestamp(report["created_at"]).strftime("%A, %B %d %Y at %H:%M")}
+
+Submitted by {report["submitter"]}
+"""
+    for entry_type, entry in report["entries"].items():
+        report_md += f"""
+### {ENTRY_HEADINGS.get(entry_type, entry_type)}
+
+{entry}
+"""
+    return report_md + "\n---\n\n"
+
+def _report_record(report, project_title):
+    return {
+        "created_at": report["created_at"],
+        "project_code": report["project_code"],
+        "project": project_title,
+        "submitter": report["submitter"],
+        **{entry_type: report["entries"].get(entry_type) for entry_type in ENTRY_TYPES}
+    }
+
+def _write_markdown(out, reports, project_titles):
+    for report in reports:
+        out.write(_report_markdown(report, project_titles.get(report["project_code"], report["project_code"]))
+                  .encode("utf-8"))
+
+def _write_csv(out, reports, project_titles):
+    text_out = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.DictWriter(text_out, fieldnames=REPORT_COLUMNS)
+    writer.writeheader()
+    for report in reports:
+        writer.writerow(_report_record(report, project_titles.get(report["project_code"])))
+    # Hand the underlying file back to the caller rather than closing it
+    text_out.flush()
+    text_out.detach()
+
+def _write_parquet(out, reports, project_titles):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [("created_at", pa.timestamp("us", tz="UTC")), ("project_code", pa.int64()),
+         ("project", pa.string()), ("submitter", pa.string())]
+        + [(entry_type, pa.string()) for entry_type in ENTRY_TYPES]
+    )
+
+    def write_row_group(writer, records):
+        batch = pd.DataFrame.from_records(records, columns=REPORT_COLUMNS)
+        batch["created_at"] = pd.to_datetime(batch["created_at"], utc=True, format="ISO8601")
+        writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+
+    with pq.ParquetWriter(out, schema) as writer:
+        records = []
+        row_groups = 0
+        for report in reports:
+            records.append(_report_record(report, project_titles.get(report["project_code"])))
+            if len(records) == PARQUET_ROW_GROUP_REPORTS:
+                write_row_group(writer, records)
+                row_groups += 1
+                records = []
+        # Always write at least one row group, so an empty export still has its columns
+        if records or row_groups == 0:
+            write_row_group(writer, records)
+
+# Stream the log history of a project (or of every project if project_code is None) into
+# the binary file 'out' as one of EXPORT_FORMATS, one page of the table at a time so memory
+# use doesn't grow with the size of the history
+# project_titles maps each project code to the title shown in the export
+def write_export(out, export_format, backend, project_titles, project_code=None):
+    reports = iter_reports(iter_log_rows(backend, project_code=project_code))
+    if export_format == "Markdown":
+        _write_markdown(out, reports, project_titles)
+    elif export_format == "CSV":
+        _write_csv(out, reports, project_titles)
+    elif export_format == "Parquet":
+        _write_parquet(out, reports, project_titles)
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
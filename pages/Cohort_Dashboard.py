@@ -0,0 +1,89 @@
+import streamlit as st
+import pandas as pd
+from data_access import get_proj_register_df, get_log_history_df
+from cohort_stats import summarise_projects, monthly_report_counts, ENTRY_TYPES, QUIET_AFTER_DAYS
+import instrumentation
+from static_assets import get_page_icon, get_stylesheet
+
+instrumentation.start_rerun("cohort_dashboard")
+
+# Use wide layout
+st.set_page_config(layout="wide",
+                   page_icon=get_page_icon(),
+                   page_title="HSMA Project Progress Dashboard")
+
+# Import stylesheet for font and page margin setting
+st.markdown(get_stylesheet(), unsafe_allow_html=True)
+
+st.title("Cohort Progress Dashboard")
+
+proj_register = get_proj_register_df()
+hsma_proj_reg_df = proj_register["df"]
+# Only the logs of the active cohort are read, so only its projects are shown
+if proj_register["partitions"] is not None:
+    hsma_proj_reg_df = hsma_proj_reg_df[
+        hsma_proj_reg_df["Project Code"].isin(proj_register["partitions"]["active_project_codes"])
+        ]
+log_history_df = get_log_history_df()
+
+with instrumentation.span("cohort_stats"):
+    project_summary = summarise_projects(hsma_proj_reg_df, log_history_df)
+    monthly_counts = monthly_report_counts(log_history_df)
+
+metric_col_1, metric_col_2, metric_col_3 = st.columns(3)
+
+metric_col_1.metric("Registered Projects", len(project_summary))
+metric_col_2.metric(f"Projects with no update in {QUIET_AFTER_DAYS}+ days", int(project_summary["Gone Quiet"].sum()))
+metric_col_3.metric("Projects never updated", int(project_summary["Last Update"].isna().sum()))
+
+st.write("---")
+
+st.subheader("Which projects have gone quiet?")
+
+min_days_quiet = st.slider("Show projects with no update for at least this many days",
+                           min_value=0, max_value=365, value=QUIET_AFTER_DAYS)
+show_never_updated = st.toggle("Include projects that have never been updated", value=True)
+
+quiet_filter = project_summary["Days Since Update"] >= min_days_quiet
+if show_never_updated:
+    quiet_filter = quiet_filter | project_summary["Last Update"].isna()
+
+st.dataframe(
+    project_summary.loc[quiet_filter, ["Full Project Title and Leads", "Last Update", "Days Since Update", "Reports"]],
+    hide_index=True,
+    use_container_width=True,
+    column_config={
+        "Last Update": st.column_config.DatetimeColumn(format="D MMM YYYY"),
+        "Days Since Update": st.column_config.NumberColumn(format="%d"),
+    }
+)
+
+st.write("---")
+
+st.subheader("Reports per month")
+
+st.bar_chart(monthly_counts.sum(axis=0).rename("Reports"))
+
+with st.expander("Reports per month for each project"):
+    st.dataframe(
+        monthly_counts.rename(columns=lambda month: pd.Timestamp(month).strftime("%b %Y")),
+        use_container_width=True
+    )
+
+st.write("---")
+
+st.subheader("Log entry types")
+
+entry_type_col_1, entry_type_col_2 = st.columns([0.4, 0.6])
+
+with entry_type_col_1:
+    st.bar_chart(project_summary[ENTRY_TYPES].sum(axis=0).rename("Entries"), horizontal=True)
+
+with entry_type_col_2:
+    st.dataframe(
+        project_summary[["Full Project Title and Leads"] + ENTRY_TYPES],
+        hide_index=True,
+        use_container_width=True
+    )
+
+instrumentation.finish_rerun()
@@ -0,0 +1,106 @@
+import tempfile
+import streamlit as st
+from data_access import get_backend, get_proj_register_df, get_portfolio_renderer
+from log_export import write_export, EXPORT_FORMATS, MAX_EXPORT_DOWNLOAD_MB
+from portfolio import PORTFOLIO_FORMATS, STATUS_RENDERING, STATUS_READY
+from static_assets import get_page_icon, get_stylesheet
+import instrumentation
+from instrumentation import log_event
+
+instrumentation.start_rerun("export_logs")
+
+# Use wide layout
+st.set_page_config(layout="wide",
+                   page_icon=get_page_icon(),
+                   page_title="HSMA Project Log Export")
+
+# Import stylesheet for font and page margin setting
+st.markdown(get_stylesheet(), unsafe_allow_html=True)
+
+st.title("Export Project Logs")
+
+st.write("""Download every log that has been submitted for a project - for example, to keep as part of
+         your portfolio of evidence. Logs from the same report are kept together.""")
+
+# Option at the top of the dropdown for exporting every project's logs at once
+ALL_PROJECTS = "All projects in the cohort"
+
+proj_register = get_proj_register_df()
+project_titles = dict(zip(proj_register["df"]["Project Code"], proj_register["df"]["Full Project Title and Leads"]))
+
+export_project = st.selectbox("Which project's logs would you like to export?",
+                              [ALL_PROJECTS] + proj_register["project_list"][1:])
+export_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True)
+
+if export_project == ALL_PROJECTS:
+    project_code = None
+    file_name = "hsma_cohort_logs"
+else:
+    project_code = proj_register["project_codes"][export_project]
+    file_name = f"hsma_project_{project_code}_logs"
+
+if st.button("Prepare export", icon=":material/download:"):
+    # The export is written to a temporary file on disk a page of logs at a time, so building
+    # it doesn't hold the whole history in memory
+    # Streamlit keeps the finished file in memory for as long as the download is offered, so
+    # exports larger than MAX_EXPORT_DOWNLOAD_MB aren't offered at all
+    with tempfile.TemporaryFile() as export_file:
+        with st.spinner("Preparing your export..."), instrumentation.span("log_export"):
+            write_export(export_file, export_format, get_backend(), project_titles, project_code=project_code)
+        export_bytes = export_file.tell()
+        log_event("logs_exported", project_code=project_code, format=export_format, bytes=export_bytes)
+
+        if export_bytes > MAX_EXPORT_DOWNLOAD_MB * 1024 ** 2:
+            st.warning(f"This export is {export_bytes / 1024 ** 2:.0f} MB, which is too large to download from here "
+                       f"(the limit is {MAX_EXPORT_DOWNLOAD_MB:g} MB). Try the Parquet format, which is much "
+                       "smaller, or export one project at a time.")
+        else:
+            export_file.seek(0)
+            st.download_button("Download", data=export_file.read(), file_name=file_name + EXPORT_FORMATS[export_format],
+                               icon=":material/save:", type="primary")
+
+st.write("---")
+st.subheader("Portfolio of Evidence")
+
+st.write("""Turn every report submitted for a project into a formatted document, with a page for each
+         report - ready to add to your portfolio of evidence.""")
+
+# Only ask the portfolio's status again every few seconds while it is being rendered - once it is
+# finished, the whole page is rerun to offer the download
+@st.fragment(run_every=2)
+def portfolio_progress_f(job):
+    if get_portfolio_renderer().get_status(job)["status"] == STATUS_RENDERING:
+        st.info("Building your portfolio - this can take a minute for a long project...", icon=":material/sync:")
+    else:
+        st.rerun()
+
+if project_code is None:
+    st.info("Choose a project above to build its portfolio.")
+else:
+    portfolio_format = st.radio("Portfolio format", list(PORTFOLIO_FORMATS), horizontal=True)
+
+    if st.button("Build portfolio", icon=":material/description:"):
+        latest_update = get_backend().get_latest_update(project_code)
+        if latest_update is None:
+            st.warning("No logs have been submitted for this project yet.")
+        else:
+            # Rendered in the background - a portfolio already built from the same logs is handed back straight away
+            job = get_portfolio_renderer().request(project_code, export_project, portfolio_format,
+                                                   latest_update["created_at"])
+            if job is None:
+                st.warning("A lot of portfolios are being built at the moment - please try again in a few minutes.")
+            st.session_state.portfolio_job = job
+
+    job = st.session_state.get("portfolio_job")
+    if job is not None and job[:2] == (int(project_code), portfolio_format):
+        status = get_portfolio_renderer().get_status(job)
+        if status["status"] == STATUS_RENDERING:
+            portfolio_progress_f(job)
+        elif status["status"] == STATUS_READY:
+            st.download_button("Download portfolio", data=status["path"].read_bytes(),
+                               file_name=f"hsma_project_{project_code}_portfolio" + PORTFOLIO_FORMATS[portfolio_format],
+                               icon=":material/save:", type="primary")
+        else:
+            st.error(f"Your portfolio couldn't be built: {status['error']}")
+
+instrumentation.finish_rerun()
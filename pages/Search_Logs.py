@@ -0,0 +1,81 @@
+from datetime import timedelta
+from time import perf_counter
+import streamlit as st
+import pandas as pd
+from data_access import get_proj_register_df, get_search_index
+from cohort_stats import ENTRY_TYPES
+from static_assets import get_page_icon, get_stylesheet
+import instrumentation
+from instrumentation import log_event
+
+instrumentation.start_rerun("search_logs")
+
+# Use wide layout
+st.set_page_config(layout="wide",
+                   page_icon=get_page_icon(),
+                   page_title="HSMA Project Log Search")
+
+# Import stylesheet for font and page margin setting
+st.markdown(get_stylesheet(), unsafe_allow_html=True)
+
+# Most matches shown on the page at once
+SEARCH_RESULTS_SHOWN = 100
+
+st.title("Search Project Logs")
+
+proj_register = get_proj_register_df()
+project_titles = dict(zip(proj_register["df"]["Project Code"], proj_register["df"]["Full Project Title and Leads"]))
+
+with st.spinner("Checking for new logs..."):
+    search_index = get_search_index()
+
+search_text = st.text_input(
+    "Search for",
+    placeholder='e.g. "data access"',
+    help="""Finds logs containing all of the words you enter. Put a phrase in double quotes to search for
+    those words together, or end a word with * to match anything starting with it."""
+    )
+
+filter_col_1, filter_col_2, filter_col_3 = st.columns([0.35, 0.4, 0.25])
+
+search_entry_types = filter_col_1.multiselect("Log entry types", ENTRY_TYPES, placeholder="All entry types")
+search_projects = filter_col_2.multiselect("Projects", proj_register["project_list"][1:], placeholder="All projects")
+search_dates = filter_col_3.date_input("Submitted between", value=[], format="DD/MM/YYYY")
+
+if search_text.strip() == "":
+    st.caption(f"{search_index.indexed_count():,} log entries can be searched")
+else:
+    start = end = None
+    if len(search_dates) == 2:
+        start = search_dates[0].isoformat()
+        # Include the whole of the last day
+        end = (search_dates[1] + timedelta(days=1)).isoformat()
+
+    search_start = perf_counter()
+    with instrumentation.span("log_search"):
+        results, total = search_index.search(
+            search_text,
+            entry_types=search_entry_types,
+            project_codes=[proj_register["project_codes"][project] for project in search_projects],
+            start=start,
+            end=end,
+            limit=SEARCH_RESULTS_SHOWN
+            )
+    search_ms = (perf_counter() - search_start) * 1000
+    log_event("logs_searched", matches=total, search_ms=round(search_ms, 2))
+
+    if total == 0:
+        st.caption(f"No matching log entries ({search_ms:.0f} ms)")
+    else:
+        st.caption(f"{total:,} matching log entries ({search_ms:.0f} ms)"
+                   + (f" - showing the best {SEARCH_RESULTS_SHOWN}" if total > SEARCH_RESULTS_SHOWN else ""))
+
+    for result in results.itertuples():
+        with st.container(border=True):
+            st.markdown(
+                f"**{project_titles.get(result.project_code, result.project_code)}**  \n"
+                f"{result.entry_type} · {pd.Timestamp(result.created_at).strftime('%d %B %Y')} · {result.submitter}"
+                )
+            st.markdown(result.snippet.replace("\n", " "))
+
+instrumentation.finish_rerun()
@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+import pandas as pd
+
+from backends import TRACKER_BACKEND
+from instrumentation import log_event
+from log_export import ENTRY_HEADINGS, iter_log_rows, iter_reports
+
+# Formats a portfolio can be rendered in, and the file extension for each
+PORTFOLIO_FORMATS = {"PDF": ".pdf", "Word": ".docx"}
+
+# Folder rendered portfolios are kept in, so an unchanged history is never rendered twice - it can be
+# deleted at any time. Kept separate for the local backend so test data never ends up in a real portfolio
+PORTFOLIO_CACHE_DIR = os.environ.get(
+    "TRACKER_PORTFOLIO_CACHE",
+    "local_portfolio_cache" if TRACKER_BACKEND == "local" else "portfolio_cache"
+    )
+
+# Number of portfolios rendered at once, each in a process of its own
+PORTFOLIO_RENDER_WORKERS = int(os.environ.get("TRACKER_PORTFOLIO_WORKERS", "2"))
+# Seconds a render process is given for one portfolio before it is stopped and the portfolio marked as failed
+PORTFOLIO_RENDER_TIMEOUT = 600
+# How much lower than the server's the render processes' CPU priority is, so the server stays responsive
+PORTFOLIO_RENDER_NICENESS = 10
+# Most portfolios waiting to be rendered at once - further requests are turned away until the queue goes down
+MAX_QUEUED_PORTFOLIOS = 100
+
+# Statuses a portfolio request can have
+STATUS_RENDERING = "rendering"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+# Characters that can't be written to a Word document (or shown in a PDF)
+_CONTROL_CHARACTERS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _clean(text):
+    return _CONTROL_CHARACTERS.sub("", str(text))
+
+# Split an entry into paragraphs at blank lines, keeping single line breaks within a paragraph
+def _paragraphs(entry):
+    return [paragraph.strip() for paragraph in re.split(r"\n\s*\n", _clean(entry)) if paragraph.strip()]
+
+def _report_date(report):
+    return pd.Timestamp(report["created_at"]).strftime("%A, %B %d %Y at %H:%M")
+
+def _summary(reports):
+    if len(reports) == 0:
+        return "No reports have been submitted for this project yet."
+    first = pd.Timestamp(reports[0]["created_at"]).strftime("%B %d %Y")
+    last = pd.Timestamp(reports[-1]["created_at"]).strftime("%B %d %Y")
+    return f"{len(reports)} progress reports, submitted between {first} and {last}."
+
+
+def _render_pdf(path, project_title, reports):
+    # reportlab is only needed by the processes rendering portfolios, so it isn't imported until then
+    from xml.sax.saxutils import escape
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate
+
+    styles = getSampleStyleSheet()
+
+    def text(content, style):
+        return Paragraph(escape(_clean(content)).replace("\n", "<br/>"), styles[style])
+
+    story = [text("HSMA Project Portfolio", "Title"), text(project_title, "Heading2"), text(_summary(reports), "BodyText")]
+    for report in reports:
+        story += [PageBreak(), text(_report_date(report), "Heading2"),
+                  text(f"Submitted by {report['submitter']}", "Italic")]
+        for entry_type, entry in report["entries"].items():
+            story.append(text(ENTRY_HEADINGS.get(entry_type, entry_type), "Heading3"))
+            story += [text(paragraph, "BodyText") for paragraph in _paragraphs(entry)]
+
+    def page_number(canvas, document):
+        canvas.setFont("Helvetica", 9)
+        canvas.drawRightString(A4[0] - document.rightMargin, document.bottomMargin / 2, f"Page {document.page}")
+
+    document = SimpleDocTemplate(path, pagesize=A4, title=f"HSMA Project Portfolio - {_clean(project_title)}",
+                                 author="HSMA Project Progress Tracker")
+    document.build(story, onLaterPages=page_number)
+
+def _render_docx(path, project_title, reports):
+    # python-docx is only needed by the processes rendering portfolios, so it isn't imported until then
+    from docx import Document
+
+    document = Document()
+    document.core_properties.title = f"HSMA Project Portfolio - {_clean(project_title)}"
+    document.add_heading("HSMA Project Portfolio", level=0)
+    document.add_paragraph(_clean(project_title), style="Subtitle")
+    document.add_paragraph(_summary(reports))
+    for report in reports:
+        document.add_page_break()
+        document.add_heading(_report_date(report), level=1)
+        document.add_paragraph().add_run(_clean(f"Submitted by {report['submitter']}")).italic = True
+        for entry_type, entry in report["entries"].items():
+            document.add_heading(ENTRY_HEADINGS.get(entry_type, entry_type), level=2)
+            for paragraph in _paragraphs(entry):
+                document.add_paragraph(paragraph)
+    document.save(path)
+
+# Render a project's reports (as grouped by log_export.iter_reports) to a portfolio document at 'path'
+def render_portfolio(path, portfolio_format, project_title, reports):
+    if portfolio_format == "PDF":
+        _render_pdf(path, project_title, reports)
+    elif portfolio_format == "Word":
+        _render_docx(path, project_title, reports)
+    else:
+        raise ValueError(f"Unknown portfolio format: {portfolio_format}")
+
+
+# A long-running process that renders one portfolio at a time, started by running this file
+# Render jobs are sent as a line of JSON on its stdin, and it answers each with a line of JSON on its stdout
+# multiprocessing's pools aren't used, as they start each process by re-running the __main__ module -
+# under Streamlit, whichever page script happens to be running
+class _RenderProcess:
+
+    def __init__(self):
+        self._process = None
+
+    def render(self, render_job):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen([sys.executable, __file__], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+        # Stop the process if it takes too long - it is started again for the next portfolio
+        process = self._process
+        timer = threading.Timer(PORTFOLIO_RENDER_TIMEOUT, process.kill)
+        timer.start()
+        try:
+            process.stdin.write(json.dumps(render_job).encode("utf-8") + b"\n")
+            process.stdin.flush()
+            answer = process.stdout.readline()
+        except OSError:
+            answer = b""
+        finally:
+            timer.cancel()
+
+        if answer == b"":
+            process.kill()
+            self._process = None
+            raise RuntimeError("The render process stopped part way through rendering the portfolio")
+        error = json.loads(answer)["error"]
+        if error is not None:
+            raise RuntimeError(error)
+
+
+# Renders portfolios of a project's whole log history on request, away from the Streamlit server
+#
+# Rendering a long history takes seconds of CPU time, which in a thread would hold up every other
+# session, so documents are rendered in separate processes at a lower priority than the server.
+# A bounded pool of threads, each with a render process of its own, fetches each project's logs,
+# hands them to its process and waits for the document, so no more processes are running and no
+# more histories are held in memory than there are threads
+#
+# Finished documents are kept on disk under the project's latest log time - asking again for a project
+# with no new logs hands back the same file, and asking for one that is already being rendered waits
+# for the same render
+class PortfolioRenderer:
+
+    def __init__(self, backend, cache_dir=PORTFOLIO_CACHE_DIR, max_workers=PORTFOLIO_RENDER_WORKERS,
+                 max_queued=MAX_QUEUED_PORTFOLIOS):
+        self.backend = backend
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="portfolio")
+        self._render_processes = threading.local()
+
+    # Documents are named after the time of the latest log in them (in nanoseconds), so the
+    # versions of a project's portfolio sort by age
+    def _version(self, job):
+        return pd.Timestamp(job[2]).value
+
+    def _path(self, job):
+        project_code, portfolio_format, _ = job
+        return self.cache_dir / f"project_{project_code}_{self._version(job)}{PORTFOLIO_FORMATS[portfolio_format]}"
+
+    # Ask for a portfolio of a project's logs up to latest_created_at (the created_at of its latest log),
+    # and return the job to poll with get_status() - or None if too many portfolios are already waiting
+    def request(self, project_code, project_title, portfolio_format, latest_created_at):
+        job = (int(project_code), portfolio_format, str(latest_created_at))
+        with self._lock:
+            if self._path(job).exists():
+                return job
+            future = self._jobs.get(job)
+            if future is not None and not (future.done() and future.exception() is not None):
+                return job
+            if sum(1 for future in self._jobs.values() if not future.done()) >= self.max_queued:
+                log_event("portfolio_queue_full", level=logging.WARNING, project_code=job[0])
+                return None
+            self._jobs[job] = self._threads.submit(self._build, job, project_title)
+        log_event("portfolio_requested", project_code=job[0], format=portfolio_format)
+        return job
+
+    # Return the status of a job, and the path of the finished document or the error it failed with
+    def get_status(self, job):
+        path = self._path(job)
+        if path.exists():
+            return {"status": STATUS_READY, "path": path, "error": None}
+        with self._lock:
+            future = self._jobs.get(job)
+        if future is None:
+            return {"status": STATUS_FAILED, "path": None, "error": "This portfolio has been replaced by a newer version - please build it again"}
+        if future.done() and future.exception() is not None:
+            return {"status": STATUS_FAILED, "path": None, "error": str(future.exception())}
+        return {"status": STATUS_RENDERING, "path": None, "error": None}
+
+    # Number of portfolios waiting for or being rendered
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for future in self._jobs.values() if not future.done())
+
+    def _build(self, job, project_title):
+        project_code, portfolio_format, _ = job
+        path = self._path(job)
+        # Rendered under a temporary name and then moved into place, so a half-written
+        # document is never handed out
+        rendering_path = path.with_name(path.name + ".rendering")
+        start = perf_counter()
+        try:
+            reports = list(iter_reports(iter_log_rows(self.backend, project_code=project_code)))
+            render_job = {"path": str(rendering_path), "portfolio_format": portfolio_format,
+                          "project_title": project_title, "reports": reports}
+            if not hasattr(self._render_processes, "process"):
+                self._render_processes.process = _RenderProcess()
+            self._render_processes.process.render(render_job)
+            os.replace(rendering_path, path)
+        except Exception as e:
+            rendering_path.unlink(missing_ok=True)
+            log_event("portfolio_render_failed", level=logging.ERROR, project_code=project_code,
+                      format=portfolio_format, error=str(e))
+            raise
+
+        # Versions of the same portfolio from before the latest log in this one are out of date now
+        version = self._version(job)
+        extension = PORTFOLIO_FORMATS[portfolio_format]
+        for old_path in self.cache_dir.glob(f"project_{project_code}_*{extension}"):
+            old_version = old_path.name[len(f"project_{project_code}_"):-len(extension)]
+            if old_version.isdigit() and int(old_version) < version:
+                old_path.unlink(missing_ok=True)
+        with self._lock:
+            self._jobs.pop(job, None)
+        log_event("portfolio_rendered", project_code=project_code, format=portfolio_format, reports=len(reports),
+                  bytes=path.stat().st_size, seconds=round(perf_counter() - start, 3))
+        return path
+
+
+# Render process - renders each job read from stdin until stdin is closed, answering each with the
+# error it failed with (or None) - anything else printed goes to stderr, to keep stdout for the answers
+if __name__ == "__main__":
+    if hasattr(os, "nice"):
+        os.nice(PORTFOLIO_RENDER_NICENESS)
+    answers = sys.stdout
+    sys.stdout = sys.stderr
+    for line in sys.stdin:
+        render_job = json.loads(line)
+        try:
+            render_portfolio(render_job["path"], render_job["portfolio_format"], render_job["project_title"],
+                             render_job["reports"])
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        answers.write(json.dumps({"error": error}) + "\n")
+        answers.flush()
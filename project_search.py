@@ -0,0 +1,135 @@
+import heapq
+import re
+from collections import defaultdict
+
+# Words are runs of letters and digits, compared in lower case
+_WORD = re.compile(r"[0-9a-z]+")
+
+# Query words shorter than a trigram are matched against the start of words, through an index of
+# every word's first one and two characters
+SHORT_PREFIX_LENGTH = 2
+
+
+def _words(text):
+    return _WORD.findall(str(text).lower())
+
+
+def _trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+# A project code as a number, for putting projects in order - codes that aren't numbers (or are
+# blank) come out as minus infinity, so they go last
+def _code_number(code):
+    try:
+        number = float(code)
+    except ValueError:
+        return float("-inf")
+    return float("-inf") if number != number else number
+
+
+# In-process index of the project register for the project search box
+#
+# Every word of a project's dropdown label (its code, title and leads) is indexed. A project matches
+# when every word of the query is found in one of its words - a query word of three or more characters
+# anywhere in a word, a shorter one at the start. Titles and names share a small vocabulary, so the
+# distinct words are indexed by their trigrams, and the projects using each word are looked up from
+# the words that match, rather than checking projects one at a time
+#
+# With the search box blank, the projects of the current cohort (current_codes) are listed first,
+# then every other project - each newest (highest code) first
+#
+# Built once each time the register is fetched, and read-only afterwards, so it can be shared
+# by every session
+class ProjectSearchIndex:
+
+    def __init__(self, labels, codes, current_codes=()):
+        self.labels = list(labels)
+        self.codes = [str(code) for code in codes]
+        self._projects_by_code = {code: project for project, code in enumerate(self.codes)}
+        current_numbers = {_code_number(code) for code in current_codes}
+        code_numbers = [_code_number(code) for code in self.codes]
+        self._blank_search_order = sorted(
+            range(len(self.labels)),
+            key=lambda project: (code_numbers[project] not in current_numbers, -code_numbers[project])
+            )
+        # Position of each project when ranked by label length, then register order
+        self._order = [0] * len(self.labels)
+        for position, project in enumerate(sorted(range(len(self.labels)), key=lambda project: len(self.labels[project]))):
+            self._order[project] = position
+
+        word_projects = defaultdict(set)
+        prefixes = defaultdict(set)
+        for project, label in enumerate(self.labels):
+            for word in _words(label):
+                word_projects[word].add(project)
+                for length in range(1, SHORT_PREFIX_LENGTH + 1):
+                    if len(word) >= length:
+                        prefixes[word[:length]].add(project)
+        word_trigrams = defaultdict(set)
+        for word in word_projects:
+            for trigram in _trigrams(word):
+                word_trigrams[trigram].add(word)
+        self._word_projects = dict(word_projects)
+        self._word_trigrams = dict(word_trigrams)
+        self._prefixes = dict(prefixes)
+
+    def __len__(self):
+        return len(self.labels)
+
+    # The projects with a word starting with the query word, and those with the query word only
+    # part way through a word
+    def _find(self, query_word):
+        if len(query_word) <= SHORT_PREFIX_LENGTH:
+            return self._prefixes.get(query_word, set()), set()
+
+        postings = sorted((self._word_trigrams.get(trigram, set()) for trigram in _trigrams(query_word)), key=len)
+        words = set(postings[0])
+        for posting in postings[1:]:
+            words &= posting
+        starting = set()
+        part_way = set()
+        for word in words:
+            if word.startswith(query_word):
+                starting |= self._word_projects[word]
+            elif query_word in word:
+                part_way |= self._word_projects[word]
+        return starting, part_way - starting
+
+    # The labels of the best 'limit' projects matching the search text (the current cohort's newest
+    # projects if the search text is blank), and how many projects matched in total
+    #
+    # Projects are ranked by their code typed in full first, then by how many query words appear
+    # part way through a word rather than at the start of one, then by the length of their label
+    def search(self, text, limit=50):
+        query_words = _words(text)
+        if len(query_words) == 0:
+            return [self.labels[project] for project in self._blank_search_order[:limit]], len(self.labels)
+
+        matches = None
+        part_way_sets = []
+        for query_word in sorted(set(query_words), key=len, reverse=True):
+            starting, part_way = self._find(query_word)
+            word_matches = starting | part_way
+            matches = word_matches if matches is None else matches & word_matches
+            if len(matches) == 0:
+                return [], 0
+            if len(part_way) > 0:
+                part_way_sets.append(part_way)
+
+        part_way_counts = defaultdict(int)
+        for part_way in part_way_sets:
+            for project in part_way & matches:
+                part_way_counts[project] += 1
+        tiers = defaultdict(set)
+        tiers[0] = matches - part_way_counts.keys()
+        for project, count in part_way_counts.items():
+            tiers[count].add(project)
+
+        best = sorted({self._projects_by_code[word] for word in query_words if word in self._projects_by_code} & matches)
+        for count in sorted(tiers):
+            if len(best) >= limit:
+                break
+            tier = tiers[count].difference(best)
+            best += heapq.nsmallest(limit - len(best), tier, key=self._order.__getitem__)
+        return [self.labels[project] for project in best[:limit]], len(matches)
@@ -0,0 +1,163 @@
+import os
+import re
+import sqlite3
+import threading
+
+import pandas as pd
+
+from backends import LOG_COLUMNS, TRACKER_BACKEND
+from instrumentation import log_event
+
+# Default location of the local search index - it can be deleted at any time and is rebuilt from the logs
+# Kept separate for the local backend so test data never turns up in searches of the real logs
+SEARCH_INDEX_DB_PATH = os.environ.get(
+    "TRACKER_SEARCH_INDEX",
+    "local_search_index.db" if TRACKER_BACKEND == "local" else "search_index.db"
+    )
+
+# Number of log rows requested from the backend at a time when bringing the index up to date
+INDEX_PAGE_SIZE = 1000
+# How many ids below the highest already indexed are read again each update
+# A log's id is given out when its write starts, but the log can't be read until the write commits -
+# so a log can turn up after logs with higher ids have already been indexed, and would be missed
+INDEX_OVERLAP_IDS = 200
+
+# Markers put around matching words in the snippets returned by a search
+HIGHLIGHT_START = "**"
+HIGHLIGHT_END = "**"
+
+# Words, or phrases in double quotes - an optional * at the end of a word matches anything starting with it
+_QUERY_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+
+# Turn what the user typed into an FTS5 query that matches logs containing all of the words and phrases
+# Each term is quoted, so punctuation and words like AND, OR and NOT are searched for as they are
+# rather than causing a syntax error
+def to_fts_query(text):
+    terms = []
+    for phrase, word in _QUERY_TERM.findall(text):
+        term = phrase or word
+        prefix = not phrase and term.endswith("*") and len(term) > 1
+        term = term.rstrip("*") if prefix else term
+        term = term.replace('"', '""')
+        if term.strip():
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+# A local full-text index of every log in the ProjectLogs table, kept in SQLite using FTS5
+#
+# The index holds its own copy of the logs, so searches never touch the database, and is brought
+# up to date by fetching only the logs from just below the highest id it already holds
+class SearchIndex:
+
+    def __init__(self, db_path=SEARCH_INDEX_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    project_code INTEGER NOT NULL,
+                    submitter TEXT,
+                    entry_type TEXT,
+                    entry TEXT
+                )
+                """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS logs_project_code_idx ON logs (project_code)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS logs_created_at_idx ON logs (created_at)")
+            # External content table - the text is stored once, in 'logs', and only the index lives here
+            # Porter stemming means a search for 'challenge' also finds 'challenges' and 'challenging'
+            self._conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+                    entry, content='logs', content_rowid='id', tokenize='porter unicode61'
+                )
+                """)
+
+    # Highest id of the logs already in the index - everything up to INDEX_OVERLAP_IDS below here has been indexed
+    def high_water_mark(self):
+        with self._lock:
+            return self._conn.execute("SELECT MAX(id) FROM logs").fetchone()[0]
+
+    def indexed_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+
+    # Add the logs in a list of rows (dicts with every column of ProjectLogs) to the index
+    # Returns the number of logs added
+    def add_rows(self, rows):
+        if len(rows) == 0:
+            return 0
+        with self._lock, self._conn:
+            # Skip anything already indexed - logs read again below the high-water mark, or indexed by
+            # another session bringing the index up to date at the same time
+            indexed_ids = {row[0] for row in self._conn.execute(
+                f"SELECT id FROM logs WHERE id IN ({', '.join('?' * len(rows))})", [row["id"] for row in rows]
+                )}
+            rows = [row for row in rows if row["id"] not in indexed_ids]
+            self._conn.executemany(
+                """INSERT INTO logs (id, created_at, project_code, submitter, entry_type, entry)
+                   VALUES (:id, :created_at, :project_code, :submitter, :entry_type, :entry)""",
+                rows
+                )
+            self._conn.executemany(
+                "INSERT INTO logs_fts (rowid, entry) VALUES (:id, :entry)",
+                rows
+                )
+        return len(rows)
+
+    # Fetch and index every log added since the last update, a page at a time
+    # Returns the number of logs added
+    def update(self, backend, page_size=INDEX_PAGE_SIZE):
+        high_water_mark = self.high_water_mark()
+        after_id = None if high_water_mark is None else high_water_mark - INDEX_OVERLAP_IDS
+        added = 0
+        while True:
+            rows = backend.get_logs(LOG_COLUMNS, after_id=after_id, limit=page_size)
+            added += self.add_rows(rows)
+            if len(rows) < page_size:
+                break
+            after_id = rows[-1]["id"]
+        if added > 0:
+            log_event("search_index_updated", added=added, high_water_mark=self.high_water_mark())
+        return added
+
+    # Find logs matching the search text, best matches first
+    # entry_types and project_codes (lists) and start and end (ISO timestamps, end exclusive)
+    # narrow down the logs searched - any left as None aren't filtered on
+    # Returns a dataframe of the matching logs (at most 'limit') with a snippet of the text around
+    # each match, and the total number of logs that matched
+    def search(self, text, entry_types=None, project_codes=None, start=None, end=None, limit=100):
+        fts_query = to_fts_query(text)
+        if fts_query == "":
+            return pd.DataFrame(columns=LOG_COLUMNS + ["snippet"]), 0
+
+        where = ["logs_fts MATCH ?"]
+        params = [fts_query]
+        if entry_types:
+            where.append(f"logs.entry_type IN ({', '.join('?' * len(entry_types))})")
+            params.extend(entry_types)
+        if project_codes:
+            where.append(f"logs.project_code IN ({', '.join('?' * len(project_codes))})")
+            params.extend(int(project_code) for project_code in project_codes)
+        if start is not None:
+            where.append("logs.created_at >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("logs.created_at < ?")
+            params.append(end)
+        from_where = f"FROM logs_fts JOIN logs ON logs.id = logs_fts.rowid WHERE {' AND '.join(where)}"
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) {from_where}", params).fetchone()[0]
+            cursor = self._conn.execute(
+                f"""SELECT logs.id, logs.created_at, logs.project_code, logs.submitter, logs.entry_type, logs.entry,
+                           snippet(logs_fts, 0, ?, ?, '…', 32)
+                    {from_where}
+                    ORDER BY bm25(logs_fts) LIMIT ?""",
+                [HIGHLIGHT_START, HIGHLIGHT_END] + params + [limit]
+                )
+            results = pd.DataFrame(cursor.fetchall(), columns=LOG_COLUMNS + ["snippet"])
+        return results, total
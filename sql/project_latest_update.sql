@@ -0,0 +1,17 @@
+-- One row per project with the time and submitter of its most recent log
+-- Used by the app to show when a project was last updated, so the page never
+-- has to pull back or sort a project's full log history
+
+create index if not exists projectlogs_project_code_created_at_idx
+    on "ProjectLogs" (project_code, created_at desc);
+
+create or replace view project_latest_update as
+select distinct on (project_code)
+    project_code,
+    created_at,
+    submitter
+from "ProjectLogs"
+order by project_code, created_at desc;
+
+-- Make the view readable with the same key the app uses for ProjectLogs
+grant select on project_latest_update to anon, authenticated;
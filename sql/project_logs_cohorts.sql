@@ -0,0 +1,22 @@
+-- The app reads the logs of the active cohort's projects (project_code in (...)) a page at a time in
+-- id order, so this index keeps those reads to the active cohort's rows however many cohorts'
+-- logs are in the table
+
+create index if not exists projectlogs_project_code_id_idx
+    on "ProjectLogs" (project_code, id);
+
+-- Archives of closed cohorts (python log_archive.py --cohort <cohort>) are kept in this private
+-- Storage bucket, so they outlast the app server's disk. The app only needs to list and download them
+
+insert into storage.buckets (id, name, public)
+values ('log-archive', 'log-archive', false)
+on conflict (id) do nothing;
+
+create policy "App can read log archives"
+    on storage.objects for select
+    to anon
+    using (bucket_id = 'log-archive');
+
+-- Writing an archive and then removing its logs from the table (--delete) is never done with the
+-- app's own key - run the archive with the service role key as SUPABASE_KEY, which is allowed to
+-- write to the bucket and delete rows
@@ -0,0 +1,10 @@
+-- Every row the app writes to ProjectLogs carries a key generated when the log is submitted
+-- The unique constraint makes writing the same row twice a no-op, so the app can retry a
+-- write that timed out (or a double-clicked submit) without creating duplicate logs
+-- Rows written before this column existed are left with a null key
+
+alter table "ProjectLogs"
+    add column if not exists idempotency_key uuid;
+
+create unique index if not exists projectlogs_idempotency_key_idx
+    on "ProjectLogs" (idempotency_key);
@@ -0,0 +1,6 @@
+-- Publish inserts into ProjectLogs to Supabase realtime, so the app hears about new logs as
+-- they are written and keeps each project's 'last updated' status current without reading
+-- the table again
+-- The app only needs inserts, but the publication sends whatever it is set up to send
+
+alter publication supabase_realtime add table "ProjectLogs";
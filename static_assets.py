@@ -0,0 +1,65 @@
+import io
+import streamlit as st
+from PIL import Image
+
+# Width (in pixels) the header logo is shown at, and the size of the page icon
+# The source images are far bigger than this (the logo is nearly 5000 pixels wide), and
+# Streamlit would otherwise shrink and re-encode them on every single rerun
+LOGO_PATH = "hsma_logo_wide_white.png"
+LOGO_WIDTH = 300
+ICON_PATH = "hsma_icon.png"
+ICON_SIZE = 128
+
+# Copies of the images already shrunk to those sizes, kept alongside the originals so a cold start
+# doesn't spend a third of a second resizing them - regenerate with `python static_assets.py`
+# after changing either image
+LOGO_SMALL_PATH = f"hsma_logo_wide_white_{LOGO_WIDTH}.png"
+ICON_SMALL_PATH = f"hsma_icon_{ICON_SIZE}.png"
+
+STYLESHEET_PATH = "style.css"
+
+
+# Shrink an image to the given width and return it as optimised PNG bytes
+# Streamlit passes an image that is already the width it is shown at straight through,
+# without decoding or re-encoding it
+def _resize_png(path, width):
+    with Image.open(path) as image:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), resample=Image.BICUBIC)
+    png = io.BytesIO()
+    resized.save(png, format="PNG", optimize=True)
+    return png.getvalue()
+
+# Read the shrunk copy of an image, only resizing the original if the copy is missing
+def _load_small_png(small_path, path, width):
+    try:
+        with open(small_path, "rb") as small_png:
+            return small_png.read()
+    except FileNotFoundError:
+        return _resize_png(path, width)
+
+# The images and stylesheet are loaded once per process and shared by every session
+# No spinner, as the page icon is loaded before set_page_config(), which must come first
+
+@st.cache_resource(show_spinner=False)
+def get_logo():
+    return _load_small_png(LOGO_SMALL_PATH, LOGO_PATH, LOGO_WIDTH)
+
+@st.cache_resource(show_spinner=False)
+def get_page_icon():
+    return _load_small_png(ICON_SMALL_PATH, ICON_PATH, ICON_SIZE)
+
+# Stylesheet as a <style> block, with blank lines and indentation stripped
+# as it is sent to the browser again on every rerun
+@st.cache_resource(show_spinner=False)
+def get_stylesheet():
+    with open(STYLESHEET_PATH) as css:
+        lines = [line.strip() for line in css]
+    return f"<style>{''.join(line for line in lines if line)}</style>"
+
+
+if __name__ == "__main__":
+    for small_path, path, width in [(LOGO_SMALL_PATH, LOGO_PATH, LOGO_WIDTH), (ICON_SMALL_PATH, ICON_PATH, ICON_SIZE)]:
+        with open(small_path, "wb") as small_png:
+            small_png.write(_resize_png(path, width))
+        print(f"Wrote {small_path}")
@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from time import time
+
+from backends import IDEMPOTENCY_KEY_COLUMN
+from instrumentation import log_event
+
+# Default location of the on-disk outbox - queued logs survive an app restart
+OUTBOX_DB_PATH = os.environ.get("TRACKER_OUTBOX_DB", "outbox.db")
+
+# Backoff settings for retrying a failed write
+# The delay doubles after each failed attempt (with jitter) up to MAX_DELAY seconds
+# Retrying a write that actually succeeded is harmless, as every row carries an idempotency key
+BASE_DELAY = 0.25
+MAX_DELAY = 30
+# After this many failed attempts a submission is marked as failed and no longer retried
+MAX_ATTEMPTS = 15
+# Written submissions are kept this many seconds (long enough for a session to see its log has
+# been saved, or for a repeated click to be recognised) and then deleted from the outbox
+SENT_RETENTION = 3600
+
+# Statuses a submission can have in the outbox
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+# Parts of a log row a submission's idempotency keys are made from - created_at is left out, as
+# each click of 'Submit' gives the same log a new timestamp
+IDEMPOTENCY_FIELDS = ["project_code", "submitter", "entry_type", "entry"]
+
+
+# Give each row of a submission an idempotency key
+# The submission as a whole gets a key generated from every one of its rows, within a namespace
+# (a UUID) belonging to the session submitting it, and each row's key is generated from that and
+# the row's entry type - so submitting the same log twice from a session gives it the same keys,
+# and a double click can't store it twice, while two different reports never share a row's key
+# even if they repeat the text of a box (e.g. 'None' under challenges)
+# The same text submitted from another session is kept apart too
+def add_idempotency_keys(rows, namespace):
+    submission = uuid.uuid5(namespace, json.dumps([[row[field] for field in IDEMPOTENCY_FIELDS] for row in rows]))
+    return [{**row, IDEMPOTENCY_KEY_COLUMN: str(uuid.uuid5(submission, row["entry_type"]))} for row in rows]
+
+# Key for a whole submission, made from the keys of its rows
+def submission_key(rows):
+    return json.dumps([row.get(IDEMPOTENCY_KEY_COLUMN) for row in rows])
+
+
+# A durable queue of log submissions, written to a local SQLite outbox and sent
+# to the database by a background thread so the Streamlit script thread never
+# blocks on retries
+#
+# insert_rows is called with the list of rows for a submission, and should raise
+# an exception if they could not be written
+# on_sent (optional) is called with the list of rows once they have been written
+class SubmissionQueue:
+
+    def __init__(self, insert_rows, on_sent=None, db_path=OUTBOX_DB_PATH,
+                 base_delay=BASE_DELAY, max_delay=MAX_DELAY, max_attempts=MAX_ATTEMPTS, sent_retention=SENT_RETENTION):
+        self.insert_rows = insert_rows
+        self.on_sent = on_sent
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.sent_retention = sent_retention
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    queued_at TEXT NOT NULL,
+                    rows TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT
+                )
+                """)
+            # Outboxes created before submissions carried idempotency keys don't have the column
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")]
+            if "submission_key" not in columns:
+                self._conn.execute("ALTER TABLE outbox ADD COLUMN submission_key TEXT")
+            if "sent_at" not in columns:
+                self._conn.execute("ALTER TABLE outbox ADD COLUMN sent_at REAL")
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS outbox_submission_key_idx ON outbox (submission_key)"
+                )
+            # Finding the next submission due, and the written ones to prune, reads just this index
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS outbox_status_next_attempt_idx ON outbox (status, next_attempt_at)"
+                )
+        self._prune_sent()
+
+        # Anything left pending from a previous run is picked up by the worker straight away
+        self._worker = threading.Thread(target=self._run, name="submission-queue", daemon=True)
+        self._worker.start()
+
+    # Add a submission to the outbox and return its id, which can be used to poll its status
+    # If a submission with the same idempotency keys is already in the outbox its id is returned
+    # instead, and if it had been given up on it is queued to be tried again
+    def submit(self, rows):
+        key = submission_key(rows) if all(IDEMPOTENCY_KEY_COLUMN in row for row in rows) else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO outbox (queued_at, rows, status, next_attempt_at, submission_key) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (submission_key) DO UPDATE SET status = excluded.status, attempts = 0,
+                   next_attempt_at = excluded.next_attempt_at WHERE status = ?""",
+                (datetime.now(timezone.utc).isoformat(), json.dumps(rows), STATUS_PENDING, time(), key, STATUS_FAILED)
+                )
+            if key is None:
+                submission_id = self._conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            else:
+                submission_id = self._conn.execute(
+                    "SELECT id FROM outbox WHERE submission_key = ?", (key,)
+                    ).fetchone()[0]
+        self._wake.set()
+        return submission_id
+
+    # Return the status, number of attempts and last error for a submission
+    def get_status(self, submission_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error FROM outbox WHERE id = ?",
+                (submission_id,)
+                ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "attempts": row[1], "last_error": row[2]}
+
+    # Number of submissions still waiting to be written
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = ?", (STATUS_PENDING,)
+                ).fetchone()[0]
+
+    # Exponential backoff with full jitter - spreads retries out so that lots of
+    # sessions don't all hammer the database at the same moment after an outage
+    def _backoff(self, attempts):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempts))
+
+    # Delete written submissions older than sent_retention, so the outbox doesn't keep the text of every log
+    # Submissions written before sent_at was recorded have none, and are deleted straight away
+    def _prune_sent(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status = ? AND (sent_at IS NULL OR sent_at < ?)",
+                (STATUS_SENT, time() - self.sent_retention)
+                )
+
+    def _next_due(self):
+        with self._lock:
+            return self._conn.execute(
+                """SELECT id, rows, attempts, next_attempt_at FROM outbox
+                   WHERE status = ? ORDER BY next_attempt_at LIMIT 1""",
+                (STATUS_PENDING,)
+                ).fetchone()
+
+    def _run(self):
+        while True:
+            due = self._next_due()
+
+            if due is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            submission_id, rows_json, attempts, next_attempt_at = due
+            wait_for = next_attempt_at - time()
+            if wait_for > 0:
+                # Sleep until the next retry is due, unless a new submission arrives first
+                self._wake.wait(timeout=wait_for)
+                self._wake.clear()
+                continue
+
+            rows = json.loads(rows_json)
+            try:
+                self.insert_rows(rows)
+            except Exception as e:
+                attempts += 1
+                status = STATUS_FAILED if attempts >= self.max_attempts else STATUS_PENDING
+                log_event("submission_attempt_failed", level=logging.WARNING,
+                          submission_id=submission_id, attempts=attempts, status=status, error=str(e))
+                with self._lock, self._conn:
+                    self._conn.execute(
+                        "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                        (status, attempts, time() + self._backoff(attempts), str(e), submission_id)
+                        )
+            else:
+                log_event("submission_written", submission_id=submission_id, attempts=attempts + 1, rows=len(rows))
+                with self._lock, self._conn:
+                    self._conn.execute(
+                        "UPDATE outbox SET status = ?, attempts = ?, sent_at = ? WHERE id = ?",
+                        (STATUS_SENT, attempts + 1, time(), submission_id)
+                        )
+                self._prune_sent()
+                if self.on_sent is not None:
+                    try:
+                        self.on_sent(rows)
+                    except Exception as e:
+                        log_event("submission_on_sent_failed", level=logging.ERROR,
+                                  submission_id=submission_id, error=str(e))
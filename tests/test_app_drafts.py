@@ -0,0 +1,57 @@
+# Run from the repository root with:
+#     python -m pytest tests
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from time import sleep
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+# Point the app at a throwaway local backend before anything reads the settings
+WORK_DIR = Path(tempfile.mkdtemp(prefix="tracker_tests_"))
+os.environ["TRACKER_BACKEND"] = "local"
+os.environ["TRACKER_LOCAL_DB"] = str(WORK_DIR / "logs.db")
+os.environ["TRACKER_LOCAL_REGISTER"] = str(WORK_DIR / "register.csv")
+os.environ["TRACKER_REGISTER_CACHE"] = str(WORK_DIR / "register_cache.parquet")
+os.environ["TRACKER_OUTBOX_DB"] = str(WORK_DIR / "outbox.db")
+os.environ["TRACKER_DRAFTS_DB"] = str(WORK_DIR / "drafts.db")
+os.environ["TRACKER_SEARCH_INDEX"] = str(WORK_DIR / "search_index.db")
+os.environ["TRACKER_LOCAL_STORAGE"] = str(WORK_DIR / "storage")
+os.environ["TRACKER_LOG_ARCHIVE"] = str(WORK_DIR / "log_archive")
+os.environ["TRACKER_PORTFOLIO_CACHE"] = str(WORK_DIR / "portfolio_cache")
+
+from streamlit.testing.v1 import AppTest
+
+from seed_local_backend import make_register_df
+
+make_register_df(20).to_csv(WORK_DIR / "register.csv", index=False)
+
+
+def draft_prompts(at):
+    return [info.value for info in at.info if "unsent draft" in info.value]
+
+
+def test_clearing_the_boxes_deletes_the_draft(monkeypatch):
+    # The app reads style.css and images relative to the working directory
+    monkeypatch.chdir(REPO_ROOT)
+    at = AppTest.from_file(str(REPO_ROOT / "app.py"), default_timeout=60).run()
+    at.selectbox[0].select(at.selectbox[0].options[3]).run()
+    at.text_input(key="submitter").input("Jo Bloggs").run()
+    at.text_area(key="simple_update").input("Half-written update").run()
+
+    # A new session for the same person and project is offered the draft
+    other = AppTest.from_file(str(REPO_ROOT / "app.py"), default_timeout=60).run()
+    other.selectbox[0].select(other.selectbox[0].options[3]).run()
+    other.text_input(key="submitter").input("Jo Bloggs").run()
+    assert len(draft_prompts(other)) == 1
+
+    next(button for button in other.button if button.label == "Clear All Text Boxes").click().run()
+    assert draft_prompts(other) == []
+    # Still gone once the store has had time to write
+    sleep(4)
+    other.run()
+    assert draft_prompts(other) == []
@@ -0,0 +1,81 @@
+# Run from the repository root with:
+#     python -m pytest tests
+
+import sys
+import uuid
+from pathlib import Path
+from time import monotonic, sleep
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backends import LOG_COLUMNS, LocalBackend
+from submission_queue import STATUS_SENT, SubmissionQueue, add_idempotency_keys
+
+
+def structured_report(created_at, progress, challenges):
+    return [
+        {"created_at": created_at, "project_code": 12, "submitter": "Jo Bloggs",
+         "entry_type": "Structured Log - Progress", "entry": progress},
+        {"created_at": created_at, "project_code": 12, "submitter": "Jo Bloggs",
+         "entry_type": "Structured Log - Challenges", "entry": challenges},
+    ]
+
+
+def wait_until_sent(queue, submission_id, timeout=10):
+    deadline = monotonic() + timeout
+    while queue.get_status(submission_id)["status"] != STATUS_SENT:
+        assert monotonic() < deadline, "submission wasn't written in time"
+        sleep(0.05)
+
+
+def test_reports_repeating_a_box_are_both_stored(tmp_path):
+    backend = LocalBackend(tmp_path / "logs.db", tmp_path / "register.csv", storage_dir=tmp_path / "storage")
+    queue = SubmissionQueue(backend.insert_logs, db_path=tmp_path / "outbox.db", base_delay=0.01)
+    namespace = uuid.uuid4()
+
+    first = add_idempotency_keys(structured_report("2026-01-01T10:00:00+00:00", "Built the model", "None"), namespace)
+    second = add_idempotency_keys(structured_report("2026-02-01T10:00:00+00:00", "Ran the model", "None"), namespace)
+    wait_until_sent(queue, queue.submit(first))
+    wait_until_sent(queue, queue.submit(second))
+
+    stored = backend.get_logs(LOG_COLUMNS)
+    assert [(row["entry_type"], row["entry"]) for row in stored] == [
+        ("Structured Log - Progress", "Built the model"),
+        ("Structured Log - Challenges", "None"),
+        ("Structured Log - Progress", "Ran the model"),
+        ("Structured Log - Challenges", "None"),
+    ]
+
+
+def test_submitting_the_same_report_twice_stores_it_once(tmp_path):
+    backend = LocalBackend(tmp_path / "logs.db", tmp_path / "register.csv", storage_dir=tmp_path / "storage")
+    queue = SubmissionQueue(backend.insert_logs, db_path=tmp_path / "outbox.db", base_delay=0.01)
+    namespace = uuid.uuid4()
+
+    # A second click gives the rows a new timestamp but the same keys
+    first = add_idempotency_keys(structured_report("2026-01-01T10:00:00+00:00", "Built the model", "None"), namespace)
+    again = add_idempotency_keys(structured_report("2026-01-01T10:00:01+00:00", "Built the model", "None"), namespace)
+    wait_until_sent(queue, queue.submit(first))
+    backend.insert_logs(again)
+
+    assert len(backend.get_logs(["id"])) == 2
+
+
+def test_written_submissions_are_pruned_from_the_outbox(tmp_path):
+    backend = LocalBackend(tmp_path / "logs.db", tmp_path / "register.csv", storage_dir=tmp_path / "storage")
+    queue = SubmissionQueue(backend.insert_logs, db_path=tmp_path / "outbox.db", base_delay=0.01, sent_retention=0)
+    namespace = uuid.uuid4()
+
+    first = queue.submit(add_idempotency_keys(structured_report("2026-01-01T10:00:00+00:00", "Built the model", "None"),
+                                              namespace))
+    deadline = monotonic() + 10
+    while queue.get_status(first) is not None:
+        assert monotonic() < deadline, "written submission wasn't pruned"
+        sleep(0.05)
+
+    # The log itself is still stored, and finding the next submission due doesn't scan the outbox
+    assert len(backend.get_logs(["id"])) == 2
+    plan = queue._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM outbox WHERE status = 'pending' ORDER BY next_attempt_at LIMIT 1"
+        ).fetchall()
+    assert "outbox_status_next_attempt_idx" in str(plan)